@@ -0,0 +1,44 @@
+"""提示词自动补全基准测试
+
+生成指定数量的提示词建立补全索引，统计建立耗时以及不同长度前缀的补全延迟，
+并测量单条提示词增删的耗时。
+
+    python benchmarks/bench_completion.py [数量]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.data.completion_index import CompletionIndex
+from bench_search import _records
+
+QUERY_REPEAT = 20
+
+
+def main(count: int):
+    records = list(_records(count, random.Random(0)))
+    index = CompletionIndex()
+    start = time.perf_counter()
+    index.add_many(records)
+    print(f"建立索引: {count} 条提示词, {len(index)} 个词条, "
+          f"{time.perf_counter() - start:.2f} 秒")
+
+    _, en, zh = records[0]
+    print(f"{'前缀':<12} {'结果':>6} {'平均 (ms)':>10}")
+    for prefix in [en[:1], en[:2], en[:4], zh[:1], zh[:2]]:
+        start = time.perf_counter()
+        for _ in range(QUERY_REPEAT):
+            results = index.complete(prefix, 10)
+        elapsed = (time.perf_counter() - start) / QUERY_REPEAT
+        print(f"{prefix!r:<12} {len(results):>6} {elapsed * 1000:>10.2f}")
+
+    start = time.perf_counter()
+    index.add('benchmark', 'benchmark prompt', '基准测试')
+    index.remove('benchmark', 'benchmark prompt')
+    print(f"增删一条提示词: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
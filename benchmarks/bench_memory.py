@@ -0,0 +1,69 @@
+"""提示词库内存占用基准测试
+
+比较原先每条提示词一个字典的存储方式与 PromptCategory 的紧凑存储，
+分别在 10 万和 100 万条提示词下统计内存占用。
+
+    python benchmarks/bench_memory.py [数量 ...]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.data.prompt_library import PromptCategory
+
+# 模拟真实词库：英文大多不同，中文翻译重复较多
+EN_VOCABULARY = 50000
+ZH_VOCABULARY = 2000
+
+
+def _fresh(text: str) -> str:
+    """生成新的字符串对象，模拟 json.load 为每个值分配的字符串"""
+    return (text + ' ')[:-1]
+
+
+def _records(count: int):
+    for i in range(count):
+        yield _fresh(f"tag number {i % EN_VOCABULARY}"), _fresh(f"标签{i % ZH_VOCABULARY}")
+
+
+def build_dicts(count: int):
+    """原先的存储方式：每条提示词一个字典"""
+    prompts = []
+    for en, zh in _records(count):
+        prompts.append({"en": en, "zh": zh})
+    return prompts
+
+
+def build_category(count: int):
+    """当前的存储方式"""
+    category = PromptCategory("benchmark")
+    for en, zh in _records(count):
+        category.add_prompt(en, zh)
+    return category
+
+
+def measure(builder, count: int) -> int:
+    """返回构建结果在内存中保留的字节数"""
+    gc.collect()
+    tracemalloc.start()
+    result = builder(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return current
+
+
+def main(counts):
+    print(f"{'数量':>10} {'字典 (MB)':>12} {'紧凑 (MB)':>12} {'节省':>8}")
+    for count in counts:
+        before = measure(build_dicts, count)
+        after = measure(build_category, count)
+        print(f"{count:>10} {before / 2**20:>12.1f} {after / 2**20:>12.1f} "
+              f"{1 - after / before:>8.0%}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000])
@@ -0,0 +1,66 @@
+"""提示词解析基准测试
+
+用常见语法（权重、交替、调度、LoRA、嵌入、转义、BREAK）随机组合出指定大小的
+提示词，统计解析为语法树和拆分为列表项的耗时，并与按逗号分割的旧做法对比；
+另外测量在中间和末尾输入一个字符后增量更新列表项的耗时。
+
+    python benchmarks/bench_prompt_parser.py [千字节]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.services.prompt_parser import IncrementalParser, parse_prompt, prompt_items
+
+REPEAT = 20
+TAGS = ["masterpiece", "best quality", "(detailed face:1.2)", "((sharp focus))",
+        "[blurry]", "[cat|dog|fox]", "[day:night:0.4]", "<lora:style_v2:0.7>",
+        "embedding:easynegative", r"\(artist\)", "猫耳", "长发", "1girl", "BREAK",
+        "(red, blue:0.8)"]
+
+
+def _prompt(size: int, rng: random.Random) -> str:
+    parts = []
+    length = 0
+    while length < size:
+        tag = rng.choice(TAGS)
+        parts.append(tag)
+        length += len(tag) + 2
+    return ", ".join(parts)[:size]
+
+
+def _best(func) -> float:
+    """REPEAT 次中最短的耗时（毫秒）"""
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _typing(text: str, position: int) -> float:
+    """在 position 处交替插入和删除一个字符，每次增量更新的耗时（毫秒）"""
+    parser = IncrementalParser(text)
+    edited = text[:position] + "x" + text[position:]
+    return _best(lambda: (parser.update(edited), parser.update(text))) / 2
+
+
+def main(kilobytes: float):
+    text = _prompt(int(kilobytes * 1024), random.Random(0))
+    prompt = parse_prompt(text)
+    assert prompt.to_source() == text
+    print(f"提示词: {len(text)} 个字符, {len(prompt_items(prompt))} 项")
+    print(f"{'步骤':<16} {'耗时 (ms)':>10}")
+    print(f"{'解析':<16} {_best(lambda: parse_prompt(text)):>10.2f}")
+    print(f"{'拆分列表项':<16} {_best(lambda: prompt_items(prompt)):>10.2f}")
+    print(f"{'按逗号分割':<16} "
+          f"{_best(lambda: [p.strip() for p in text.replace('，', ',').split(',')]):>10.2f}")
+    print(f"{'中间输入一个字符':<16} {_typing(text, len(text) // 2):>10.2f}")
+    print(f"{'末尾输入一个字符':<16} {_typing(text, len(text)):>10.2f}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 50)
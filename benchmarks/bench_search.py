@@ -0,0 +1,58 @@
+"""提示词库搜索基准测试
+
+生成指定数量的提示词建立搜索索引，统计建立耗时以及常见查询
+（单个前缀、多个宽泛前缀、中文片段、中英混合）的平均延迟。
+
+    python benchmarks/bench_search.py [数量]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.data.search_index import SearchIndex
+
+# 模拟真实词库：英文由常用单词组合，中文由常用词组合
+EN_VOCABULARY = 30000
+ZH_VOCABULARY = 5000
+QUERY_REPEAT = 20
+
+
+def _records(count: int, rng: random.Random):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = [''.join(rng.choice(letters) for _ in range(rng.randint(3, 9)))
+             for _ in range(EN_VOCABULARY)]
+    # 中文翻译由常用词组合而成
+    zh_words = [''.join(chr(0x4e00 + rng.randrange(2500)) for _ in range(rng.randint(1, 3)))
+                for _ in range(ZH_VOCABULARY)]
+    for i in range(count):
+        en = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+        zh = ''.join(rng.choice(zh_words) for _ in range(rng.randint(1, 3)))
+        yield f"category{i % 50}", en, zh
+
+
+def main(count: int):
+    rng = random.Random(0)
+    records = list(_records(count, rng))
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.add_many(records)
+    print(f"建立索引: {count} 条, {time.perf_counter() - start:.2f} 秒")
+
+    _, en, zh = records[0]
+    queries = [en[:1], en[:3], en.split()[0], 'a b', 's t c', zh[:1], zh[:2],
+               f"{en[:2]} {zh[:1]}"]
+    print(f"{'查询':<16} {'结果':>6} {'平均 (ms)':>10}")
+    for query in queries:
+        # 第一次查询会建立短前缀缓存，不计入平均值
+        index.search(query, 200)
+        start = time.perf_counter()
+        for _ in range(QUERY_REPEAT):
+            results = index.search(query, 200)
+        elapsed = (time.perf_counter() - start) / QUERY_REPEAT
+        print(f"{query!r:<16} {len(results):>6} {elapsed * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
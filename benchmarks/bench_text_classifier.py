@@ -0,0 +1,53 @@
+"""中文检测基准测试
+
+对指定数量的提示词比较原来逐字符比较的生成器表达式与 text_classifier 中
+基于正则表达式的 has_cjk、classify 和 classify_many，分别测量中文提示词占
+0%、10%、50% 和 100% 时的耗时。
+
+    python benchmarks/bench_text_classifier.py [数量]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.services.text_classifier import classify, classify_many, has_cjk
+
+REPEAT = 20
+RATIOS = (0.0, 0.1, 0.5, 1.0)
+LATIN_TAGS = ["masterpiece", "best quality", "1girl", "long hair", "blue eyes",
+              "(detailed face:1.2)", "<lora:style_v2:0.7>", "looking at viewer"]
+CJK_TAGS = ["猫耳", "长发，黑色", "red 猫耳", "𠀀字", "汉服 dress", "微笑"]
+
+
+def _old_has_chinese(text):
+    return any('\u4e00' <= char <= '\u9fff' for char in text)
+
+
+def _best(func) -> float:
+    """REPEAT 次中最短的耗时（毫秒）"""
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(count: int):
+    rng = random.Random(0)
+    print(f"{'中文比例':<8} {'生成器 (ms)':>12} {'has_cjk':>10} {'classify':>10} "
+          f"{'classify_many':>14}")
+    for ratio in RATIOS:
+        texts = [rng.choice(CJK_TAGS) if rng.random() < ratio else rng.choice(LATIN_TAGS)
+                 for _ in range(count)]
+        print(f"{ratio:<8.0%} "
+              f"{_best(lambda: [_old_has_chinese(text) for text in texts]):>12.2f} "
+              f"{_best(lambda: [has_cjk(text) for text in texts]):>10.2f} "
+              f"{_best(lambda: [classify(text) for text in texts]):>10.2f} "
+              f"{_best(lambda: classify_many(texts)):>14.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,199 @@
+"""翻译服务基准测试
+
+在本地启动一个 LibreTranslate 风格的模拟翻译服务，可设置每个请求的延迟、
+出错概率和单次请求的字符上限，不访问外部网络。对 10、100、1000、10000 个
+提示词的列表分别测量 translate_text、batch_translate、translate_prompts 的
+p50/p95 延迟、平均每个提示词的请求数和每秒翻译的字符数。
+
+每轮测试使用新的空缓存，另外单独测量缓存全部命中时的 translate_prompts。
+提示词库查找被替换为空词典，只测量缓存和网络部分。
+
+    python benchmarks/bench_translation.py [延迟毫秒] [出错概率] [字符上限]
+"""
+import json
+import os
+import re
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.services.resilience import CircuitBreaker
+from src.services.translation_backends import LibreTranslateBackend
+from src.services.translation_cache import TranslationCache
+from src.services.translator import TranslationService
+
+SIZES = (10, 100, 1000, 10000)
+# 每个规模重复的轮数，延迟分位数在各轮之间统计
+ROUNDS = 5
+# translate_text 逐个翻译，只测量前若干个提示词
+SINGLE_LIMIT = 50
+# 提示词由该数量的单词组合，长列表中会出现重复
+VOCABULARY = 3000
+# 一行译文：可选的序号标记和其后的文本
+_LINE = re.compile(r'(\[\[\d+\]\] )?(.*)', re.S)
+
+
+class MockTranslator(ThreadingHTTPServer):
+    """模拟翻译服务，译文为每行原文加上前缀"""
+    daemon_threads = True
+
+    def __init__(self, latency: float, error_rate: float, char_limit: int):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.char_limit = char_limit
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def count(self) -> bool:
+        """记录一次请求，返回是否模拟出错"""
+        with self._lock:
+            self.requests += 1
+            return self._rng.random() < self.error_rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头和正文分两次发送，不关闭 Nagle 算法时每个请求会多出约 40 ms
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        failed = server.count()
+        time.sleep(server.latency)
+        if failed:
+            self._reply(503, {'error': 'unavailable'})
+        elif len(body['q']) > server.char_limit:
+            self._reply(400, {'error': 'text too long'})
+        else:
+            # 像真实接口一样保留每行开头的序号标记
+            lines = [_LINE.match(line).groups() for line in body['q'].split('\n')]
+            self._reply(200, {'translatedText': '\n'.join(
+                f"{marker or ''}译:{text}" for marker, text in lines)})
+
+    def _reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _EmptyLibrary:
+    """不含任何提示词的词库"""
+    def lookup_translations(self, texts, to_english=False):
+        return {}
+
+
+def _prompts(count: int, rng: random.Random):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = [''.join(rng.choice(letters) for _ in range(rng.randint(3, 9)))
+             for _ in range(VOCABULARY)]
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+            for _ in range(count)]
+
+
+def _service(server: MockTranslator, cache_dir: str) -> TranslationService:
+    cache = TranslationCache(os.path.join(cache_dir, f"{time.perf_counter_ns()}.db"))
+    backend = LibreTranslateBackend(server.url, char_limit=server.char_limit)
+    # 限流和熔断会掩盖分块与缓存本身的开销，基准测试中放宽
+    return TranslationService(cache=cache, library=_EmptyLibrary(), backend=backend,
+                              rate_limit=10_000,
+                              breaker=CircuitBreaker(threshold=1.0, min_calls=1_000_000))
+
+
+def _measure(server: MockTranslator, cache_dir: str, prompts, run, warm: bool = False):
+    """运行 ROUNDS 轮，返回 (延迟列表, 请求数, 字符数)"""
+    latencies = []
+    requests = 0
+    chars = 0
+    for _ in range(ROUNDS):
+        service = _service(server, cache_dir)
+        if warm:
+            service.batch_translate(prompts)
+        before = server.requests
+        chars += run(service, prompts, latencies)
+        requests += server.requests - before
+        service.close()
+        service.cache.close()
+    return latencies, requests, chars
+
+
+def _run_single(service, prompts, latencies):
+    chars = 0
+    for prompt in prompts[:SINGLE_LIMIT]:
+        start = time.perf_counter()
+        service.translate_text(prompt)
+        latencies.append(time.perf_counter() - start)
+        chars += len(prompt)
+    return chars
+
+
+def _run_batch(service, prompts, latencies):
+    start = time.perf_counter()
+    service.batch_translate(prompts)
+    latencies.append(time.perf_counter() - start)
+    return sum(map(len, prompts))
+
+
+def _run_prompts(service, prompts, latencies):
+    start = time.perf_counter()
+    service.translate_prompts(list(enumerate(prompts)))
+    latencies.append(time.perf_counter() - start)
+    return sum(map(len, prompts))
+
+
+def _percentile(values, q: float) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[int(q * 100) - 1]
+
+
+def main(latency_ms: float, error_rate: float, char_limit: int):
+    server = MockTranslator(latency_ms / 1000, error_rate, char_limit)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    rng = random.Random(0)
+    print(f"模拟服务: 延迟 {latency_ms:g} ms, 出错概率 {error_rate:g}, 字符上限 {char_limit}")
+    print(f"{'方法':<24} {'数量':>6} {'p50 (ms)':>10} {'p95 (ms)':>10} "
+          f"{'请求/提示词':>10} {'字符/秒':>12}")
+    runs = [('translate_text', _run_single, False),
+            ('batch_translate', _run_batch, False),
+            ('translate_prompts', _run_prompts, False),
+            ('translate_prompts (缓存)', _run_prompts, True)]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for size in SIZES:
+            prompts = _prompts(size, rng)
+            for name, run, warm in runs:
+                try:
+                    latencies, requests, chars = _measure(server, cache_dir, prompts, run, warm)
+                except Exception as e:
+                    print(f"{name:<24} {size:>6} 失败: {e}")
+                    continue
+                translated = min(size, SINGLE_LIMIT) if run is _run_single else size
+                print(f"{name:<24} {size:>6} "
+                      f"{_percentile(latencies, 0.5) * 1000:>10.1f} "
+                      f"{_percentile(latencies, 0.95) * 1000:>10.1f} "
+                      f"{requests / (translated * ROUNDS):>10.3f} "
+                      f"{chars / sum(latencies):>12.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 50,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 0.0,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 5000)
@@ -0,0 +1,173 @@
+"""提示词库二进制格式
+
+文件由四部分组成，所有整数均为小端：
+
+    文件头      magic, 版本, 分类数, 提示词数, 分类表/提示词表/字符串表的偏移
+    分类表      每个分类一条定长记录：键、名称、描述在字符串表中的偏移和长度，
+                第一条提示词的序号以及提示词数量
+    提示词表    每条提示词一条定长记录：英文、中文在字符串表中的偏移和长度
+    字符串表    去重后的 UTF-8 字符串
+
+读取时通过 mmap 映射整个文件，打开文件只解析文件头和分类表；
+提示词只有在访问对应分类时才解码，映射的页面在多个进程之间共享。
+"""
+import mmap
+import struct
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+MAGIC = b'PMLB'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<4sIIIQQQ')
+_CATEGORY = struct.Struct('<8I')
+_PROMPT = struct.Struct('<4I')
+
+
+class BinaryFormatError(ValueError):
+    """二进制提示词库文件格式错误"""
+    pass
+
+
+class BinaryRange(NamedTuple):
+    """分类的提示词在提示词表中的位置：第一条的序号和数量"""
+    first: int
+    count: int
+
+
+class CategoryRecord(NamedTuple):
+    """分类表中的一条记录"""
+    key: str
+    name: str
+    description: str
+    range: BinaryRange
+
+
+class MappedLibrary:
+    """以只读方式映射的二进制提示词库"""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_header()
+        except BaseException:
+            self._mm.close()
+            raise
+
+    def _read_header(self):
+        if len(self._mm) < _HEADER.size:
+            raise BinaryFormatError("文件头不完整")
+        (magic, version, self.category_count, self.prompt_count,
+         self._categories_offset, self._prompts_offset,
+         self._strings_offset) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise BinaryFormatError("不是提示词库二进制文件")
+        if version != FORMAT_VERSION:
+            raise BinaryFormatError(f"不支持的文件版本 {version}")
+        if (self._categories_offset + self.category_count * _CATEGORY.size > len(self._mm)
+                or self._prompts_offset + self.prompt_count * _PROMPT.size > len(self._mm)
+                or self._strings_offset > len(self._mm)):
+            raise BinaryFormatError("文件已截断")
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return str(self._mm[start:start + length], 'utf-8')
+
+    def categories(self) -> Iterator[CategoryRecord]:
+        """按顺序读取分类表"""
+        for i in range(self.category_count):
+            (key_off, key_len, name_off, name_len, desc_off, desc_len,
+             first, count) = _CATEGORY.unpack_from(
+                 self._mm, self._categories_offset + i * _CATEGORY.size)
+            yield CategoryRecord(self._string(key_off, key_len),
+                                 self._string(name_off, name_len),
+                                 self._string(desc_off, desc_len),
+                                 BinaryRange(first, count))
+
+    def prompts(self, prompts_range: BinaryRange) -> List[Tuple[str, str]]:
+        """解码一个分类的提示词，返回 (英文, 中文) 列表"""
+        if prompts_range.first + prompts_range.count > self.prompt_count:
+            raise BinaryFormatError("提示词序号超出范围")
+        string = self._string
+        start = self._prompts_offset + prompts_range.first * _PROMPT.size
+        end = start + prompts_range.count * _PROMPT.size
+        return [(string(en_off, en_len), string(zh_off, zh_len))
+                for en_off, en_len, zh_off, zh_len
+                in _PROMPT.iter_unpack(self._mm[start:end])]
+
+    def close(self):
+        self._mm.close()
+
+
+class _StringTable:
+    """写入时收集字符串，相同的字符串只保存一份"""
+    def __init__(self):
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._chunks: List[bytes] = []
+        self._size = 0
+
+    def add(self, text: str) -> Tuple[int, int]:
+        location = self._offsets.get(text)
+        if location is None:
+            raw = text.encode('utf-8')
+            location = (self._size, len(raw))
+            self._offsets[text] = location
+            self._chunks.append(raw)
+            self._size += len(raw)
+        return location
+
+    def write(self, f: BinaryIO):
+        for chunk in self._chunks:
+            f.write(chunk)
+
+
+def write_binary_library(f: BinaryIO, data: Dict[str, dict],
+                         source: Optional[MappedLibrary] = None) -> Dict[str, BinaryRange]:
+    """写入二进制提示词库，返回各分类在新文件中的位置
+
+    prompts 可以是提示词列表，也可以是 source 中的 BinaryRange。
+    """
+    strings = _StringTable()
+    category_records = []
+    prompt_records = []
+    positions = {}
+    for key, cat_data in data.items():
+        prompts = cat_data['prompts']
+        if isinstance(prompts, BinaryRange):
+            pairs = source.prompts(prompts)
+        else:
+            pairs = ((p['en'], p['zh']) for p in prompts)
+        first = len(prompt_records)
+        for en, zh in pairs:
+            prompt_records.append(_PROMPT.pack(*strings.add(en), *strings.add(zh)))
+        positions[key] = BinaryRange(first, len(prompt_records) - first)
+        category_records.append(_CATEGORY.pack(
+            *strings.add(key), *strings.add(cat_data['name']),
+            *strings.add(cat_data['description']), *positions[key]))
+
+    categories_offset = _HEADER.size
+    prompts_offset = categories_offset + len(category_records) * _CATEGORY.size
+    strings_offset = prompts_offset + len(prompt_records) * _PROMPT.size
+    f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(category_records),
+                         len(prompt_records), categories_offset,
+                         prompts_offset, strings_offset))
+    f.write(b''.join(category_records))
+    f.write(b''.join(prompt_records))
+    strings.write(f)
+    return positions
+
+
+def iter_binary_records(path: str, progress: Optional[Callable[[int, int], None]] = None
+                        ) -> Iterator[tuple]:
+    """逐个分类读取二进制提示词库，产出与 JSON 流式解析相同的记录"""
+    library = MappedLibrary(path)
+    try:
+        total = library.category_count
+        for done, record in enumerate(library.categories(), 1):
+            yield ('add_category', record.key, record.name, record.description)
+            for en, zh in library.prompts(record.range):
+                yield ('add_prompt', record.key, en, zh)
+            if progress:
+                progress(done, total)
+    finally:
+        library.close()
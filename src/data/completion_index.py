@@ -0,0 +1,158 @@
+"""提示词自动补全索引
+
+英文和中文都作为补全词条，按 (规范化词条, 英文) 排序保存在几个对齐的
+数组中，前缀对应的词条通过二分查找得到。每个词条有一个分数（使用次数
+优先，其次是在词库中出现的次数），在前缀范围内取分数最高的若干条。
+词库修改时逐条插入或删除词条，不需要重建。
+
+词条只保存规范化文本和英文的引用，规范化文本与原文相同时直接引用原文；
+显示的词条和提示在返回结果时再从各分类已索引的提示词中查找。
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import nsmallest
+from typing import Dict, List, NamedTuple, Optional
+from .record_index import RecordIndex
+
+# 前缀上界，用于在有序数组中确定前缀范围
+_MAX_CHAR = chr(0x10FFFF)
+# 分数中使用次数的权重，保证使用过的词条排在只在词库中出现的词条之前
+_USAGE_WEIGHT = 1 << 24
+
+
+class Completion(NamedTuple):
+    """一条补全结果：插入的英文、匹配的词条以及提示"""
+    text: str
+    term: str
+    hint: str
+
+
+def normalize_term(text: str) -> str:
+    return text.strip().casefold()
+
+
+class CompletionIndex(RecordIndex):
+    """按前缀补全提示词，分数越高越靠前，条目为中文"""
+    def __init__(self, usage: Optional[Dict[str, int]] = None):
+        super().__init__()
+        # 规范化词条和英文，按 (规范化词条, 英文) 排序；批量添加时先追加在末尾
+        self._terms: List[str] = []
+        self._ens: List[str] = []
+        # 与词条对齐：在词库中出现的次数，以及排序分数（越小越靠前）
+        self._counts = array('i')
+        self._scores = array('q')
+        # 英文 -> 通过补全插入的次数，重新加载词库后仍然保留
+        self.usage = usage if usage is not None else {}
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def _score(self, pos: int) -> int:
+        return -(self.usage.get(self._ens[pos], 0) * _USAGE_WEIGHT + self._counts[pos])
+
+    def _position(self, term: str, en: str) -> int:
+        """词条 (term, en) 在有序数组中的位置，不存在时为插入位置"""
+        start = bisect_left(self._terms, term)
+        return bisect_left(self._ens, en, start, bisect_right(self._terms, term, start))
+
+    def _find(self, term: str, en: str) -> Optional[int]:
+        """词条 (term, en) 的位置，不存在时返回 None"""
+        pos = self._position(term, en)
+        if pos < len(self._terms) and self._terms[pos] == term and self._ens[pos] == en:
+            return pos
+        return None
+
+    def _add_term(self, text: str, en: str):
+        term = normalize_term(text)
+        if not term:
+            return
+        if term == text:
+            term = text
+        if self._batch:
+            # 批量添加时只追加，_end_batch 中统一排序并合并重复的词条
+            self._terms.append(term)
+            self._ens.append(en)
+            self._counts.append(1)
+            return
+        pos = self._position(term, en)
+        if pos < len(self._terms) and self._terms[pos] == term and self._ens[pos] == en:
+            self._counts[pos] += 1
+            self._scores[pos] = self._score(pos)
+            return
+        self._terms.insert(pos, term)
+        self._ens.insert(pos, en)
+        self._counts.insert(pos, 1)
+        self._scores.insert(pos, self._score(pos))
+
+    def _remove_term(self, text: str, en: str):
+        pos = self._find(normalize_term(text), en)
+        if pos is None:
+            return
+        self._counts[pos] -= 1
+        if self._counts[pos]:
+            self._scores[pos] = self._score(pos)
+            return
+        del self._terms[pos]
+        del self._ens[pos]
+        del self._counts[pos]
+        del self._scores[pos]
+
+    def _insert(self, key: str, en: str, zh: str) -> str:
+        self._add_term(en, en)
+        if zh:
+            self._add_term(zh, en)
+        return zh
+
+    def _end_batch(self):
+        terms, ens, counts = self._terms, self._ens, self._counts
+        order = sorted(range(len(terms)), key=lambda i: (terms[i], ens[i]))
+        self._terms, self._ens, self._counts = [], [], array('i')
+        for i in order:
+            term, en = terms[i], ens[i]
+            if self._terms and self._terms[-1] == term and self._ens[-1] == en:
+                self._counts[-1] += counts[i]
+            else:
+                self._terms.append(term)
+                self._ens.append(en)
+                self._counts.append(counts[i])
+        usage = self.usage
+        self._scores = array('q', (-(usage.get(en, 0) * _USAGE_WEIGHT + count)
+                                   for en, count in zip(self._ens, self._counts)))
+
+    def _delete(self, key: str, en: str, zh: str):
+        self._remove_term(en, en)
+        if zh:
+            self._remove_term(zh, en)
+
+    def _translations(self, en: str) -> List[str]:
+        """各分类中该英文提示词的中文"""
+        return [zh for prompts in self._prompts.values()
+                for zh in [prompts.get(en)] if zh is not None]
+
+    def record_use(self, en: str):
+        """记录一次补全的使用，更新该英文对应词条的分数"""
+        self.usage[en] = self.usage.get(en, 0) + 1
+        for text in {en, *self._translations(en)}:
+            pos = self._find(normalize_term(text), en)
+            if pos is not None:
+                self._scores[pos] = self._score(pos)
+
+    def _completion(self, pos: int) -> Completion:
+        """位置 pos 的词条：英文词条以中文为提示，中文词条以英文为提示"""
+        term, en = self._terms[pos], self._ens[pos]
+        translations = self._translations(en)
+        if term == normalize_term(en):
+            return Completion(en, en, next((zh for zh in translations if zh), ''))
+        zh = next((zh for zh in translations if normalize_term(zh) == term), term)
+        return Completion(en, zh, en)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Completion]:
+        """返回以 prefix 开头的词条，按分数排序"""
+        prefix = normalize_term(prefix)
+        if not prefix:
+            return []
+        start = bisect_left(self._terms, prefix)
+        end = bisect_left(self._terms, prefix + _MAX_CHAR, start)
+        # 分数与位置组成的元组在 C 层比较，位置同时保证同分时按词条排序
+        best = nsmallest(limit, zip(self._scores[start:end], range(start, end)))
+        return [self._completion(pos) for _, pos in best]
@@ -0,0 +1,305 @@
+"""提示词库 JSON 文件的流式解析
+
+按块读取文件，边解析边产出记录，不需要把整个文档读入内存。
+只识别提示词库的固定结构：
+
+    {"<分类键>": {"name": ..., "description": ..., "prompts": [{"en": ..., "zh": ...}, ...]}, ...}
+
+产出的记录与存储后端的修改操作一致：
+
+    ('add_category', key, name, description)
+    ('add_prompt', key, en, zh)
+
+同时记录每个分类 prompts 数组在文件中的字节区间，供按需加载分类使用。
+"""
+import json
+import os
+import re
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# 单个词法单元：字符串、结构符号或其他标量
+_TOKEN = re.compile(
+    rb'\s*(?:"([^"\\]*(?:\\.[^"\\]*)*)"|([{}\[\]:,])|(-?[0-9][0-9.eE+-]*|true|false|null))',
+    re.S)
+# 连续的、不含嵌套结构的提示词对象，走快速路径一次解码
+_FLAT_OBJECT = rb'\{[^{}"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}"]*)*\}'
+_FLAT_OBJECTS = re.compile(rb'\s*(%s(?:\s*,\s*%s)*)' % (_FLAT_OBJECT, _FLAT_OBJECT), re.S)
+
+# 可能被块边界截断的单元的首字符
+_TRUNCATABLE = frozenset(b'"-0123456789tfn'[i:i + 1] for i in range(15))
+
+CHUNK_SIZE = 1024 * 1024
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class LibraryFormatError(ValueError):
+    """提示词库文件格式错误"""
+    pass
+
+
+class PromptsRange(NamedTuple):
+    """分类的 prompts 数组在库文件中的字节区间 [start, end)"""
+    start: int
+    end: int
+    count: int
+
+
+class _Reader:
+    """按块读取文件并切分词法单元"""
+    def __init__(self, f, total: int, progress: Optional[ProgressCallback],
+                 chunk_size: int):
+        self._f = f
+        self._total = total
+        self._progress = progress
+        self._chunk_size = chunk_size
+        self._buf = b''
+        self._pos = 0
+        self._read = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """读取下一块数据，已到文件末尾时返回 False"""
+        if self._eof:
+            return False
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        self._read += len(chunk)
+        if self._progress:
+            self._progress(self._read, self._total)
+        return True
+
+    def offset(self) -> int:
+        """下一个未读取字节在文件中的位置"""
+        return self._read - len(self._buf) + self._pos
+
+    def token(self) -> Tuple[int, bytes]:
+        """返回 (类型, 内容)，类型 1 为字符串，2 为结构符号，3 为标量"""
+        while True:
+            m = _TOKEN.match(self._buf, self._pos)
+            if m:
+                # 标量可能被块边界截断，需要读取更多数据确认
+                if m.lastindex != 3 or m.end() < len(self._buf) or not self._fill():
+                    break
+                continue
+            rest = self._buf[self._pos:].lstrip()
+            # 只有空白、未闭合的字符串或标量开头才可能是被截断的单元
+            if (not rest or rest[:1] in _TRUNCATABLE) and self._fill():
+                continue
+            if rest:
+                raise LibraryFormatError(f"无法解析的内容，位置 {self.offset()}")
+            raise LibraryFormatError("文件意外结束")
+        self._pos = m.end()
+        return m.lastindex, m.group(m.lastindex)
+
+    def flat_objects(self) -> Optional[list]:
+        """尝试一次读取缓冲区中连续的不含嵌套的对象，失败时由调用方逐个单元解析"""
+        m = _FLAT_OBJECTS.match(self._buf, self._pos)
+        if not m:
+            return None
+        self._pos = m.end()
+        return json.loads(b'[' + m.group(1) + b']')
+
+    def expect(self, symbol: bytes):
+        kind, value = self.token()
+        if kind != 2 or value != symbol:
+            raise LibraryFormatError(f"应为 '{symbol.decode()}'，实际为 '{value.decode('utf-8', 'replace')}'")
+
+    def string(self) -> str:
+        kind, value = self.token()
+        if kind != 1:
+            raise LibraryFormatError(f"应为字符串，实际为 '{value.decode('utf-8', 'replace')}'")
+        return _decode_string(value)
+
+    def value(self):
+        """读取任意 JSON 值"""
+        kind, value = self.token()
+        return self._value(kind, value)
+
+    def _value(self, kind: int, value: bytes):
+        if kind == 1:
+            return _decode_string(value)
+        if kind == 3:
+            return json.loads(value)
+        if value == b'{':
+            result = {}
+            kind, value = self.token()
+            while not _is_symbol(kind, value, b'}'):
+                if _is_symbol(kind, value, b','):
+                    kind, value = self.token()
+                    continue
+                if kind != 1:
+                    raise LibraryFormatError("对象的键应为字符串")
+                key = _decode_string(value)
+                self.expect(b':')
+                result[key] = self.value()
+                kind, value = self.token()
+            return result
+        if value == b'[':
+            result = []
+            kind, value = self.token()
+            while not _is_symbol(kind, value, b']'):
+                if not _is_symbol(kind, value, b','):
+                    result.append(self._value(kind, value))
+                kind, value = self.token()
+            return result
+        raise LibraryFormatError(f"意外的符号 '{value.decode()}'")
+
+
+def _is_symbol(kind: int, value: bytes, symbol: bytes) -> bool:
+    """是否为结构符号 symbol，内容相同的字符串不算"""
+    return kind == 2 and value == symbol
+
+
+def _decode_string(raw: bytes) -> str:
+    if b'\\' not in raw:
+        return raw.decode('utf-8')
+    return json.loads(b'"' + raw + b'"')
+
+
+def iter_library_records(path: str, progress: Optional[ProgressCallback] = None,
+                         chunk_size: int = CHUNK_SIZE,
+                         ranges: Optional[Dict[str, PromptsRange]] = None
+                         ) -> Iterator[tuple]:
+    """流式读取提示词库文件，逐条产出分类和提示词记录
+
+    progress 在每读取一块数据后以 (已读取字节数, 文件总字节数) 调用。
+    传入 ranges 时记录每个分类 prompts 数组的字节区间。
+    """
+    total = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        reader = _Reader(f, total, progress, chunk_size)
+        # 跳过 UTF-8 BOM
+        reader._fill()
+        if reader._buf.startswith(b'\xef\xbb\xbf'):
+            reader._pos = 3
+
+        reader.expect(b'{')
+        while True:
+            kind, value = reader.token()
+            if _is_symbol(kind, value, b'}'):
+                break
+            if _is_symbol(kind, value, b','):
+                continue
+            if kind != 1:
+                raise LibraryFormatError("分类键应为字符串")
+            key = _decode_string(value)
+            reader.expect(b':')
+            yield from _iter_category(reader, key, ranges)
+
+
+def _iter_category(reader: _Reader, key: str,
+                   ranges: Optional[Dict[str, PromptsRange]]) -> Iterator[tuple]:
+    """读取单个分类对象"""
+    reader.expect(b'{')
+    name = key
+    description = ""
+    # 分类信息需要在提示词之前产出；若 name 出现在 prompts 之后则再次产出更新
+    emitted = None
+    while True:
+        kind, value = reader.token()
+        if _is_symbol(kind, value, b'}'):
+            break
+        if _is_symbol(kind, value, b','):
+            continue
+        if kind != 1:
+            raise LibraryFormatError("分类字段名应为字符串")
+        field = _decode_string(value)
+        reader.expect(b':')
+        if field != 'prompts':
+            field_value = reader.value()
+            if field == 'name':
+                name = field_value
+            elif field == 'description':
+                description = field_value
+            continue
+
+        if emitted != (name, description):
+            emitted = (name, description)
+            yield ('add_category', key, name, description)
+        reader.expect(b'[')
+        start = reader.offset() - 1
+        count = 0
+        while True:
+            prompts = reader.flat_objects()
+            if prompts is None:
+                kind, value = reader.token()
+                if _is_symbol(kind, value, b']'):
+                    break
+                if _is_symbol(kind, value, b','):
+                    continue
+                prompts = [reader._value(kind, value)]
+            count += len(prompts)
+            for prompt in prompts:
+                yield ('add_prompt', key, prompt['en'], prompt.get('zh', ""))
+        if ranges is not None:
+            ranges[key] = PromptsRange(start, reader.offset(), count)
+
+    if emitted != (name, description):
+        yield ('add_category', key, name, description)
+
+
+def read_prompts_range(path: str, prompts_range: PromptsRange) -> List[Tuple[str, str]]:
+    """读取单个分类的 prompts 数组，返回 (英文, 中文) 列表"""
+    with open(path, 'rb') as f:
+        f.seek(prompts_range.start)
+        raw = f.read(prompts_range.end - prompts_range.start)
+    return [(p['en'], p.get('zh', "")) for p in json.loads(raw)]
+
+
+def _dumps(value: str) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def write_library_json(f: BinaryIO, data: Dict[str, dict],
+                       source_path: Optional[str] = None) -> Dict[str, PromptsRange]:
+    """以 json.dump(indent=4) 的格式写入提示词库，返回各分类的字节区间
+
+    prompts 可以是提示词列表，也可以是 source_path 中的 PromptsRange，
+    后者直接复制原文件中的字节，不需要解析。
+    """
+    ranges = {}
+    source = open(source_path, 'rb') if source_path else None
+    try:
+        offset = 0
+
+        def write(text):
+            nonlocal offset
+            raw = text.encode('utf-8') if isinstance(text, str) else text
+            f.write(raw)
+            offset += len(raw)
+
+        write('{')
+        for i, (key, cat_data) in enumerate(data.items()):
+            write(('\n' if i == 0 else ',\n') +
+                  f'    {_dumps(key)}: {{\n'
+                  f'        "name": {_dumps(cat_data["name"])},\n'
+                  f'        "description": {_dumps(cat_data["description"])},\n'
+                  f'        "prompts": ')
+            start = offset
+            prompts = cat_data['prompts']
+            if isinstance(prompts, PromptsRange):
+                source.seek(prompts.start)
+                write(source.read(prompts.end - prompts.start))
+                count = prompts.count
+            elif prompts:
+                write('[\n' + ',\n'.join(
+                    f'            {{\n'
+                    f'                "en": {_dumps(p["en"])},\n'
+                    f'                "zh": {_dumps(p["zh"])}\n'
+                    f'            }}' for p in prompts) + '\n        ]')
+                count = len(prompts)
+            else:
+                write('[]')
+                count = 0
+            ranges[key] = PromptsRange(start, offset, count)
+            write('\n    }')
+        write('\n}' if data else '}')
+    finally:
+        if source:
+            source.close()
+    return ranges
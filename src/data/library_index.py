@@ -0,0 +1,136 @@
+"""提示词库偏移索引
+
+大型 JSON 库在启动时只读取 ``<库文件>.idx``：其中记录每个分类的名称、描述、
+提示词数量以及 prompts 数组在库文件中的字节区间。分类的提示词在第一次
+访问时才从对应区间读取。
+
+索引中保存库文件的大小、修改时间和首尾数据的哈希，任何一项与当前文件
+不一致时重新扫描库文件生成索引。
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+from .json_stream import (ProgressCallback, PromptsRange, iter_library_records,
+                          read_prompts_range)
+
+INDEX_VERSION = 1
+
+# 超过该大小（字节）的 JSON 库按需加载分类
+LAZY_LOAD_THRESHOLD = 8 * 1024 * 1024
+
+# 计算文件哈希时读取的首尾字节数
+_HASH_SAMPLE = 64 * 1024
+
+
+def index_path_for(path: str) -> str:
+    return f"{path}.idx"
+
+
+def file_signature(path: str) -> dict:
+    """库文件签名：大小、修改时间以及首尾数据的 SHA-1"""
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        digest.update(f.read(_HASH_SAMPLE))
+        if stat.st_size > _HASH_SAMPLE:
+            f.seek(max(_HASH_SAMPLE, stat.st_size - _HASH_SAMPLE))
+            digest.update(f.read())
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'hash': digest.hexdigest()}
+
+
+class IndexEntry:
+    """索引中的一个分类"""
+    __slots__ = ('key', 'name', 'description', 'range')
+
+    def __init__(self, key: str, name: str, description: str, prompts_range: PromptsRange):
+        self.key = key
+        self.name = name
+        self.description = description
+        self.range = prompts_range
+
+
+def load_index(path: str) -> Optional[List[IndexEntry]]:
+    """读取库文件的索引，索引不存在或已过期时返回 None"""
+    try:
+        with open(index_path_for(path), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != INDEX_VERSION:
+            return None
+        if index.get('signature') != file_signature(path):
+            return None
+        return [IndexEntry(c['key'], c['name'], c['description'],
+                           PromptsRange(c['start'], c['end'], c['count']))
+                for c in index['categories']]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_index(path: str, entries: List[IndexEntry]):
+    """写入库文件的索引"""
+    index = {
+        'version': INDEX_VERSION,
+        'signature': file_signature(path),
+        'categories': [{'key': e.key, 'name': e.name, 'description': e.description,
+                        'start': e.range.start, 'end': e.range.end,
+                        'count': e.range.count} for e in entries],
+    }
+    with open(index_path_for(path), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+
+
+def build_index(path: str, progress: Optional[ProgressCallback] = None) -> List[IndexEntry]:
+    """扫描库文件生成索引，提示词读取后立即丢弃"""
+    ranges: Dict[str, PromptsRange] = {}
+    info: Dict[str, Tuple[str, str]] = {}
+    for record in iter_library_records(path, progress, ranges=ranges):
+        if record[0] == 'add_category':
+            info[record[1]] = (record[2], record[3])
+    return [IndexEntry(key, name, description,
+                       ranges.get(key, PromptsRange(0, 0, 0)))
+            for key, (name, description) in info.items()]
+
+
+class LazyPrompts:
+    """尚未加载的分类提示词
+
+    由存储后端创建并持有，分类第一次访问提示词时调用 load()。
+    """
+    __slots__ = ()
+
+    @property
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def load(self) -> List[Tuple[str, str]]:
+        """读取分类的全部提示词，返回 (英文, 中文) 列表"""
+        raise NotImplementedError
+
+    def snapshot(self):
+        """整体写入时代表这些提示词的不可变句柄，由存储后端自行解读"""
+        raise NotImplementedError
+
+
+class FileRangePrompts(LazyPrompts):
+    """JSON 库文件中某个字节区间内的提示词，库文件重写后由存储后端更新区间"""
+    __slots__ = ('path', 'range', 'lock')
+
+    def __init__(self, path: str, prompts_range: PromptsRange, lock):
+        self.path = path
+        self.range = prompts_range
+        self.lock = lock
+
+    @property
+    def count(self) -> int:
+        return self.range.count
+
+    def load(self) -> List[Tuple[str, str]]:
+        """读取提示词，持有存储锁以免与库文件替换同时进行"""
+        with self.lock:
+            if self.range.count == 0:
+                return []
+            return read_prompts_range(self.path, self.range)
+
+    def snapshot(self) -> PromptsRange:
+        return self.range
@@ -0,0 +1,95 @@
+"""提示词库后台写入线程"""
+import threading
+import time
+from typing import Callable, Optional
+
+
+class DebouncedWriter:
+    """后台写入线程，合并短时间内的多次保存请求
+
+    修改时调用 mark_dirty() 标记，线程在最后一次修改之后等待 delay 秒
+    再执行一次写入，因此连续的编辑只会触发一次整体写入。持续编辑时
+    最迟在第一次未保存的修改之后 max_wait 秒写入。
+    """
+    def __init__(self, write: Callable[[], None], delay: float = 0.5,
+                 max_wait: float = 5.0, name: str = "library-writer"):
+        self._write = write
+        self.delay = delay
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._dirty = False
+        self._writing = False
+        self._closed = False
+        self._deadline = 0.0
+        # 第一次未保存的修改的时间
+        self._first_dirty = 0.0
+        self.last_error: Optional[Exception] = None
+        # 使用守护线程，退出时由 close() 负责写入剩余修改
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> bool:
+        """是否有尚未写入的修改"""
+        with self._cond:
+            return self._dirty or self._writing
+
+    def mark_dirty(self):
+        """标记需要写入，重新开始计时，但不晚于第一次修改后 max_wait 秒"""
+        with self._cond:
+            now = time.monotonic()
+            if not self._dirty:
+                self._dirty = True
+                self._first_dirty = now
+            self._deadline = min(now + self.delay, self._first_dirty + self.max_wait)
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if not self._dirty:
+                    return
+                # 等待修改停止一段时间后再写入
+                while not self._closed:
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._dirty = False
+                self._writing = True
+
+            error = None
+            try:
+                self._write()
+            except Exception as e:
+                error = e
+                print(f"保存提示词库失败: {e}")
+
+            with self._cond:
+                self._writing = False
+                self.last_error = error
+                self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """立即写入尚未保存的修改（包括上次失败的写入）并等待完成"""
+        with self._cond:
+            if self._closed:
+                return self.last_error is None
+            if self.last_error is not None:
+                self._dirty = True
+            if self._dirty:
+                self._deadline = 0.0
+                self._cond.notify_all()
+            self._cond.wait_for(lambda: not self._dirty and not self._writing,
+                                timeout)
+            return not self._dirty and not self._writing and self.last_error is None
+
+    def close(self):
+        """写入剩余修改并结束线程"""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
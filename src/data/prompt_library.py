@@ -1,58 +1,558 @@
-import json
+import atexit
 import os
-from typing import Dict, List
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from .binary_format import iter_binary_records
+from .completion_index import Completion, CompletionIndex
+from .json_stream import ProgressCallback, iter_library_records
+from .library_index import LazyPrompts
+from .record_index import RecordIndex
+from .search_index import SearchIndex, SearchResult
+from .storage import BINARY_EXTENSIONS, create_storage
+from .translation_dictionary import TranslationDictionary
+
+# 合并导入时英文相同的提示词的处理方式
+MERGE_KEEP_LOCAL = 'keep_local'          # 保留本地提示词
+MERGE_KEEP_INCOMING = 'keep_incoming'    # 使用导入的中文
+MERGE_FILL_EMPTY = 'fill_empty'          # 仅在本地中文为空时使用导入的中文
+MERGE_POLICIES = (MERGE_KEEP_LOCAL, MERGE_KEEP_INCOMING, MERGE_FILL_EMPTY)
+
+
+def normalize_prompt_key(en: str) -> str:
+    """合并时比较英文提示词使用的键：忽略大小写，合并连续空白"""
+    return ' '.join(en.split()).casefold()
+
+
+class MergeSummary:
+    """合并导入的统计结果"""
+    __slots__ = ('added', 'updated', 'skipped')
+
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.skipped = 0
+
+    def __repr__(self) -> str:
+        return (f"MergeSummary(added={self.added}, updated={self.updated}, "
+                f"skipped={self.skipped})")
+
+
+class PromptEntry:
+    """单条提示词
+
+    使用 __slots__ 省去每条记录的实例字典，字符串经过驻留，
+    相同的英文或中文在内存中只保存一份。支持 ``prompt["en"]``
+    形式的读取，与原先的字典结构兼容。
+    """
+    __slots__ = ('en', 'zh')
+
+    def __init__(self, en: str, zh: str = ""):
+        self.en = sys.intern(en)
+        self.zh = sys.intern(zh)
+
+    def __getitem__(self, field: str) -> str:
+        if field == 'en':
+            return self.en
+        if field == 'zh':
+            return self.zh
+        raise KeyError(field)
+
+    def __repr__(self) -> str:
+        return f"PromptEntry(en={self.en!r}, zh={self.zh!r})"
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"en": self.en, "zh": self.zh}
 
 class PromptCategory:
     def __init__(self, name: str, description: str = ""):
         self.name = name
         self.description = description
-        self.prompts: List[Dict[str, str]] = []
+        # 删除的提示词留下 None 占位，避免移动后续元素
+        self._entries: List[Optional[PromptEntry]] = []
+        # 英文提示词 -> 在 _entries 中的位置（重复时为列表），首次查找时才建立
+        self._positions: Optional[Dict[str, Union[int, List[int]]]] = None
+        self._removed = 0
+        # 按需加载的分类在第一次访问提示词前保存其在库文件中的位置
+        self._lazy: Optional[LazyPrompts] = None
+
+    @classmethod
+    def lazy(cls, name: str, description: str, lazy: LazyPrompts) -> 'PromptCategory':
+        """创建第一次访问时才读取提示词的分类"""
+        category = cls(name, description)
+        category._lazy = lazy
+        return category
+
+    @property
+    def is_loaded(self) -> bool:
+        """提示词是否已经读入内存"""
+        return self._lazy is None
+
+    def _load(self):
+        lazy = self._lazy
+        if lazy is not None:
+            # 先读入完整的列表再一次性发布，其他线程读取 prompts、len() 或
+            # is_loaded 时不会看到只加载了一部分的分类
+            self._entries = [PromptEntry(en, zh) for en, zh in lazy.load()]
+            self._lazy = None
+
+
+    @property
+    def prompts(self) -> List[PromptEntry]:
+        """按添加顺序返回所有提示词"""
+        self._load()
+        return [p for p in self._entries if p is not None]
+
+    def __len__(self) -> int:
+        if self._lazy is not None:
+            return self._lazy.count
+        return len(self._entries) - self._removed
+
+    def export_prompts(self) -> List[Dict[str, str]]:
+        """导出提示词，未加载的分类直接从文件读取而不保留在内存中"""
+        if self._lazy is not None:
+            return [{"en": en, "zh": zh} for en, zh in self._lazy.load()]
+        return [p.to_dict() for p in self.prompts]
+
+    def prompt_pairs(self) -> List[Tuple[str, str]]:
+        """所有提示词的 (英文, 中文)，未加载的分类直接从文件读取而不保留在内存中
+
+        从文件读取的字符串同样经过驻留，各索引以及之后加载的分类共用同一份。
+        """
+        lazy = self._lazy
+        if lazy is not None:
+            return [(sys.intern(en), sys.intern(zh)) for en, zh in lazy.load()]
+        return [(p.en, p.zh) for p in self._entries if p is not None]
+
+    def snapshot_prompts(self) -> list:
+        """供存储后端整体写入的提示词，未加载的分类返回存储后端提供的句柄"""
+        if self._lazy is not None:
+            return self._lazy.snapshot()
+        return self.prompts
 
     def add_prompt(self, en: str, zh: str = ""):
-        self.prompts.append({
-            "en": en,
-            "zh": zh
-        })
+        self._load()
+        if self._positions is not None:
+            self._index_position(en, len(self._entries))
+        self._entries.append(PromptEntry(en, zh))
+
+    def _index_position(self, en: str, pos: int):
+        current = self._positions.get(en)
+        if current is None:
+            self._positions[en] = pos
+        elif isinstance(current, list):
+            current.append(pos)
+        else:
+            self._positions[en] = [current, pos]
+
+    def _ensure_index(self) -> Dict[str, Union[int, List[int]]]:
+        self._load()
+        if self._positions is None:
+            self._positions = {}
+            for pos, prompt in enumerate(self._entries):
+                if prompt is not None:
+                    self._index_position(prompt.en, pos)
+        return self._positions
+
+    def prompt_zh(self, en: str) -> Optional[str]:
+        """英文为 en 的第一条提示词的中文，不存在时返回 None"""
+        positions = self._ensure_index().get(en)
+        if positions is None:
+            return None
+        if isinstance(positions, list):
+            positions = positions[0]
+        return self._entries[positions].zh
+
+    def has_prompt(self, en: str) -> bool:
+        """是否包含指定的英文提示词"""
+        return en in self._ensure_index()
+
+    def update_prompt(self, en: str, zh: str) -> int:
+        """修改所有英文为 en 的提示词的中文，返回修改的数量"""
+        positions = self._ensure_index().get(en)
+        if positions is None:
+            return 0
+        if not isinstance(positions, list):
+            positions = [positions]
+        for pos in positions:
+            self._entries[pos] = PromptEntry(en, zh)
+        return len(positions)
+
+    def remove_prompt(self, en: str) -> int:
+        """删除所有英文为 en 的提示词，返回删除的数量"""
+        positions = self._ensure_index().pop(en, None)
+        if positions is None:
+            return 0
+        if not isinstance(positions, list):
+            positions = [positions]
+        for pos in positions:
+            self._entries[pos] = None
+        self._removed += len(positions)
+        # 占位过多时整理一次，均摊后每次删除仍为 O(1)
+        if self._removed * 2 > len(self._entries):
+            self._compact()
+        return len(positions)
+
+    def _compact(self):
+        """移除删除留下的占位，位置索引在下次查找时重建"""
+        self._entries = self.prompts
+        self._positions = None
+        self._removed = 0
+
+class _IndexBuild:
+    """一次后台建立索引的进度
+
+    建立线程逐个分类在持有存储锁时读取提示词，读取之后该分类的修改记录
+    暂存在 pending 中，所有分类完成后依次应用，再发布索引。
+    """
+    __slots__ = ('index', 'done', 'pending', 'cancelled', 'thread')
+
+    def __init__(self, index: RecordIndex):
+        self.index = index
+        # 已经读取的分类键
+        self.done = set()
+        self.pending: List[tuple] = []
+        self.cancelled = False
+        self.thread: Optional[threading.Thread] = None
+
 
 class PromptLibrary:
     def __init__(self):
         self.categories: Dict[str, PromptCategory] = {}
+        # 分类名称 -> 分类键，名称重复时按添加顺序排列
+        self._name_index: Dict[str, List[str]] = {}
+        # 在后台线程中建立，之后随修改增量更新
+        self._search_index: Optional[SearchIndex] = None
+        self._completion_index: Optional[CompletionIndex] = None
+        self._dictionary: Optional[TranslationDictionary] = None
+        # 索引属性名 -> 正在进行的后台建立
+        self._index_builds: Dict[str, _IndexBuild] = {}
+        # 英文 -> 通过补全插入的次数，切换词库后仍然保留
+        self._completion_usage: Dict[str, int] = {}
         self.library_path = os.path.join(os.path.dirname(__file__), 'prompts.json')
+        self.storage = create_storage(self.library_path, self._snapshot)
         self.load_library()
     
-    def set_library_path(self, path: str):
+    def set_library_path(self, path: str,
+                         progress: Optional[ProgressCallback] = None):
         """设置提示词库路径"""
+        self.storage.close()
         self.library_path = path
-        self.load_library()
+        self.storage = create_storage(path, self._snapshot)
+        self.load_library(progress)
     
-    def load_library(self):
-        """从 JSON 文件加载提示词库"""
+    def load_library(self, progress: Optional[ProgressCallback] = None):
+        """从存储后端流式加载提示词库
+
+        progress 以 (已完成, 总量) 调用，可用于显示加载进度；
+        回调时已读取的分类已经可以通过 categories 访问。
+        """
+        # 先等待后台写入完成，写入线程取快照时需要持有存储锁
+        self.storage.flush()
+        with self.storage.lock:
+            self.categories = {}
+            self._name_index = {}
+            try:
+                for record in self.storage.load_records(progress):
+                    self._apply_record(record)
+            except Exception as e:
+                print(f"加载提示词库失败: {e}")
+                # 加载失败时使用空库
+                self.categories = {}
+                self._name_index = {}
+        self._notify(('reload',))
+
+    def _apply_record(self, record: tuple):
+        """在内存中应用一条加载记录，不写入存储"""
+        op, key = record[0], record[1]
+        if op == 'add_prompt':
+            category = self.categories.get(key)
+            if category is not None:
+                category.add_prompt(record[2], record[3])
+        elif op == 'add_category':
+            _, _, name, description = record
+            category = self.categories.get(key)
+            if category is None:
+                self._insert_category(key, PromptCategory(name, description))
+            elif category.name != name or category.description != description:
+                # 分类信息在提示词之后出现时更新名称索引
+                self._unindex_name(key, category.name)
+                category.name = name
+                category.description = description
+                self._name_index.setdefault(name, []).append(key)
+        elif op == 'lazy_prompts':
+            category = self.categories.get(key)
+            if category is not None:
+                self.categories[key] = PromptCategory.lazy(
+                    category.name, category.description, record[2])
+        elif op == 'delete_category':
+            if key in self.categories:
+                self._remove_category(key)
+        elif op == 'update_prompt':
+            category = self.categories.get(key)
+            if category is not None:
+                category.update_prompt(record[2], record[3])
+        elif op == 'delete_prompt':
+            category = self.categories.get(key)
+            if category is not None:
+                category.remove_prompt(record[2])
+
+    def _insert_category(self, key: str, category: PromptCategory):
+        """添加分类并更新名称索引"""
+        self.categories[key] = category
+        self._name_index.setdefault(category.name, []).append(key)
+
+    def _remove_category(self, key: str):
+        """移除分类并更新名称索引"""
+        category = self.categories.pop(key)
+        self._unindex_name(key, category.name)
+
+    def _unindex_name(self, key: str, name: str):
+        keys = self._name_index[name]
+        keys.remove(key)
+        if not keys:
+            del self._name_index[name]
+
+    def _notify(self, record: tuple):
+        """把一次修改应用到已建立和正在建立的索引
+
+        record 与存储记录相同，如 ('add_prompt', key, en, zh)、
+        ('delete_category', key)；重新加载提示词库后为 ('reload',)。
+        """
+        with self.storage.lock:
+            if record[0] == 'reload':
+                self._search_index = None
+                self._completion_index = None
+                self._dictionary = None
+                for build in self._index_builds.values():
+                    build.cancelled = True
+                self._index_builds = {}
+            else:
+                for build in self._index_builds.values():
+                    if record[1] in build.done:
+                        build.pending.append(record)
+            for index in (self._search_index, self._completion_index, self._dictionary):
+                if index is not None:
+                    index.apply(record)
+
+    def _ready_index(self, attr: str, factory: Callable[[], RecordIndex],
+                     wait: bool = False) -> Optional[RecordIndex]:
+        """已建立的索引，尚未建立时在后台开始建立
+
+        wait 为 False 时不等待，建立完成前返回 None。
+        """
+        while True:
+            index = getattr(self, attr)
+            if index is not None:
+                return index
+            with self.storage.lock:
+                build = self._index_builds.get(attr)
+                if build is None:
+                    build = self._index_builds[attr] = _IndexBuild(factory())
+                    build.thread = threading.Thread(
+                        target=self._build_index, args=(attr, build),
+                        name='library-index', daemon=True)
+                    build.thread.start()
+            if not wait:
+                return None
+            # 建立期间重新加载会取消这次建立，之后重新开始
+            build.thread.join()
+
+    def _build_index(self, attr: str, build: _IndexBuild):
+        """在后台线程中执行：逐个分类建立索引，完成后赋值给 attr
+
+        未加载的分类直接从文件读取，不会因此留在内存中。每个分类只在读取时
+        持有存储锁，建立索引的耗时不影响界面线程的修改。
+        """
+        with self.storage.lock:
+            keys = list(self.categories)
+        while True:
+            # 所有分类一次批量添加，词表和补全词条只在最后排序一次
+            build.index.add_many(self._build_records(build, keys))
+            with self.storage.lock:
+                if build.cancelled:
+                    return
+                # 建立期间新增的分类
+                keys = [key for key in self.categories if key not in build.done]
+                if keys:
+                    continue
+                for record in build.pending:
+                    build.index.apply(record)
+                setattr(self, attr, build.index)
+                if self._index_builds.get(attr) is build:
+                    del self._index_builds[attr]
+                return
+
+    def _build_records(self, build: _IndexBuild, keys: List[str]) -> Iterable[tuple]:
+        """依次读取各分类的 (分类键, 英文, 中文)，读取时持有存储锁并把分类记为已读取"""
+        for key in keys:
+            with self.storage.lock:
+                if build.cancelled:
+                    return
+                category = self.categories.get(key)
+                try:
+                    pairs = category.prompt_pairs() if category is not None else []
+                except Exception as e:
+                    print(f"建立索引时读取分类失败: {e}")
+                    pairs = []
+                build.done.add(key)
+            for en, zh in pairs:
+                yield key, en, zh
+
+    def prepare_search(self):
+        """在后台开始建立搜索索引，例如搜索框获得焦点时"""
+        self._ready_index('_search_index', SearchIndex)
+
+    @property
+    def search_ready(self) -> bool:
+        """搜索索引是否已经建立，尚未开始建立时在后台开始"""
+        return self._ready_index('_search_index', SearchIndex) is not None
+
+    def search(self, query: str, limit: int = 50) -> List[SearchResult]:
+        """搜索英文（单词前缀）和中文，返回 (分类键, 英文, 中文) 列表
+
+        索引在第一次使用时由后台线程建立，完成前调用会等待，界面中应先检查
+        search_ready。
+        """
+        return self._ready_index('_search_index', SearchIndex, wait=True).search(query, limit)
+
+    def _new_completion_index(self) -> CompletionIndex:
+        return CompletionIndex(self._completion_usage)
+
+    def prepare_completion(self):
+        """在后台开始建立补全索引，例如输入框获得焦点时"""
+        self._ready_index('_completion_index', self._new_completion_index)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Completion]:
+        """补全以 prefix 开头的英文或中文提示词，常用的排在前面
+
+        索引在第一次使用时由后台线程建立，完成前返回空列表，不会阻塞输入。
+        """
+        index = self._ready_index('_completion_index', self._new_completion_index)
+        if index is None:
+            return []
+        return index.complete(prefix, limit)
+
+    def lookup_translations(self, texts: Iterable[str],
+                            to_english: bool = False) -> Dict[str, str]:
+        """在提示词库中查找翻译，返回找到的 {原文: 译文}
+
+        第一次查找时在后台线程中建立对照词典并等待其完成，未加载的分类直接从
+        文件读取，不会因此留在内存中。可在任意线程调用，但不能持有存储锁。
+        """
+        dictionary = self._ready_index('_dictionary', TranslationDictionary, wait=True)
+        # 后台翻译线程也会调用，查找时持有存储锁避免与修改同时进行
+        with self.storage.lock:
+            return dictionary.lookup_many(texts, to_english)
+
+    def record_completion_use(self, en: str):
+        """记录一次补全的使用，提高其排序"""
+        if self._completion_index is not None:
+            self._completion_index.record_use(en)
+        else:
+            self._completion_usage[en] = self._completion_usage.get(en, 0) + 1
+
+    def find_category(self, name: str) -> Optional[Tuple[str, PromptCategory]]:
+        """按名称查找分类，返回 (键, 分类)"""
+        keys = self._name_index.get(name)
+        if not keys:
+            return None
+        return keys[0], self.categories[keys[0]]
+
+    def has_prompt(self, category_name: str, en: str) -> bool:
+        """分类中是否已有该英文提示词"""
+        found = self.find_category(category_name)
+        return found is not None and found[1].has_prompt(en)
+
+    @contextmanager
+    def _saving(self):
+        """持久化单次修改，失败时只打印错误"""
         try:
-            with open(self.library_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
+            yield
+        except Exception as e:
+            print(f"保存提示词库失败: {e}")
+
+    def merge_library(self, data: dict, policy: str = MERGE_KEEP_LOCAL) -> MergeSummary:
+        """合并导入的提示词库，英文相同（忽略大小写和多余空白）的提示词按 policy 处理"""
+        def records():
             for key, cat_data in data.items():
-                category = PromptCategory(cat_data['name'], cat_data['description'])
+                yield ('add_category', key, cat_data['name'], cat_data['description'])
                 for prompt in cat_data['prompts']:
-                    category.add_prompt(prompt['en'], prompt['zh'])
-                self.categories[key] = category
-                
-        except Exception as e:
-            print(f"加载提示词库失败: {e}")
-            # 加载失败时使用空库
-            self.categories = {}
+                    yield ('add_prompt', key, prompt['en'], prompt.get('zh', ""))
+        return self._merge_records(records(), policy)
 
-    def merge_library(self, data: dict):
-        """合并导入的提示词库"""
-        for key, cat_data in data.items():
-            if key not in self.categories:
-                self.categories[key] = PromptCategory(
-                    cat_data['name'], 
-                    cat_data['description']
-                )
-            for prompt in cat_data['prompts']:
-                self.categories[key].add_prompt(prompt['en'], prompt['zh'])
-        self.save_library()
+    def merge_library_file(self, path: str, policy: str = MERGE_KEEP_LOCAL,
+                           progress: Optional[ProgressCallback] = None) -> MergeSummary:
+        """流式读取并合并 JSON 或二进制提示词库文件"""
+        if os.path.splitext(path)[1].lower() in BINARY_EXTENSIONS:
+            records = iter_binary_records(path, progress)
+        else:
+            records = iter_library_records(path, progress)
+        return self._merge_records(records, policy)
+
+    def _merge_records(self, records: Iterable[tuple], policy: str) -> MergeSummary:
+        """按记录合并，所有修改在一个事务中提交"""
+        if policy not in MERGE_POLICIES:
+            raise ValueError(f"未知的合并策略: {policy}")
+        summary = MergeSummary()
+        # 分类键 -> {规范化英文: 本地英文}，合并过程中新增的提示词也会加入
+        known: Dict[str, Dict[str, str]] = {}
+        # 本次合并新建的分类，导入文件中分类信息出现在提示词之后时需要更新
+        created = set()
+        with self.storage.lock, self.storage.transaction():
+            for record in records:
+                op, key = record[0], record[1]
+                if op == 'add_category':
+                    _, _, name, description = record
+                    category = self.categories.get(key)
+                    if category is None:
+                        created.add(key)
+                        self._insert_category(key, PromptCategory(name, description))
+                    elif key in created and (category.name, category.description) != (name, description):
+                        self._apply_record(record)
+                    else:
+                        continue
+                    self.storage.add_category(key, name, description)
+                    self._notify(record)
+                    continue
+
+                _, _, en, zh = record
+                category = self.categories.get(key)
+                if category is None:
+                    continue
+                index = known.get(key)
+                if index is None:
+                    index = known[key] = {}
+                    for prompt in category.prompts:
+                        index.setdefault(normalize_prompt_key(prompt.en), prompt.en)
+                normalized = normalize_prompt_key(en)
+                local_en = index.get(normalized)
+                if local_en is None:
+                    index[normalized] = en
+                    category.add_prompt(en, zh)
+                    self.storage.add_prompt(key, en, zh)
+                    self._notify(record)
+                    summary.added += 1
+                elif self._should_update(category, local_en, zh, policy):
+                    category.update_prompt(local_en, zh)
+                    self.storage.update_prompt(key, local_en, zh)
+                    self._notify(('update_prompt', key, local_en, zh))
+                    summary.updated += 1
+                else:
+                    summary.skipped += 1
+        return summary
+
+    @staticmethod
+    def _should_update(category: PromptCategory, local_en: str, zh: str,
+                       policy: str) -> bool:
+        """根据合并策略判断是否用导入的中文覆盖本地提示词"""
+        if policy == MERGE_KEEP_LOCAL or not zh:
+            return False
+        local_zh = category.prompt_zh(local_en)
+        if policy == MERGE_KEEP_INCOMING:
+            return local_zh != zh
+        return not local_zh
     
     def export_library(self) -> dict:
         """导出提示词库数据"""
@@ -61,52 +561,99 @@ class PromptLibrary:
             data[key] = {
                 'name': category.name,
                 'description': category.description,
-                'prompts': category.prompts
+                'prompts': category.export_prompts()
+            }
+        return data
+
+    def _snapshot(self) -> dict:
+        """供存储后端整体写入的快照，调用方需持有存储锁"""
+        data = {}
+        for key, category in self.categories.items():
+            data[key] = {
+                'name': category.name,
+                'description': category.description,
+                'prompts': category.snapshot_prompts()
             }
         return data
     
     def add_category(self, name: str, description: str = ""):
         """添加新分类"""
         key = name.lower().replace(" ", "_")
-        if key not in self.categories:
-            self.categories[key] = PromptCategory(name, description)
-            self.save_library()
+        with self.storage.lock:
+            if key not in self.categories:
+                self._insert_category(key, PromptCategory(name, description))
+                with self._saving():
+                    self.storage.add_category(key, name, description)
+                self._notify(('add_category', key, name, description))
     
     def add_prompt(self, category_name: str, en: str, zh: str):
         """添加新提示词"""
-        for category in self.categories.values():
-            if category.name == category_name:
+        with self.storage.lock:
+            found = self.find_category(category_name)
+            if found:
+                key, category = found
                 category.add_prompt(en, zh)
-                self.save_library()
-                break
+                with self._saving():
+                    self.storage.add_prompt(key, en, zh)
+                self._notify(('add_prompt', key, en, zh))
     
     def delete_category(self, name: str):
         """删除分类"""
-        for key, category in list(self.categories.items()):
-            if category.name == name:
-                del self.categories[key]
-                self.save_library()
-                break
+        with self.storage.lock:
+            found = self.find_category(name)
+            if found:
+                key, _ = found
+                self._remove_category(key)
+                with self._saving():
+                    self.storage.delete_category(key)
+                self._notify(('delete_category', key))
     
     def delete_prompt(self, category_name: str, prompt_en: str):
         """删除提示词"""
-        for category in self.categories.values():
-            if category.name == category_name:
-                category.prompts = [p for p in category.prompts 
-                                  if p['en'] != prompt_en]
-                self.save_library()
-                break
+        self.delete_prompts(category_name, [prompt_en])
+    
+    def delete_prompts(self, category_name: str, prompts_en: Iterable[str]):
+        """批量删除同一分类中的提示词"""
+        with self.storage.lock:
+            found = self.find_category(category_name)
+            if not found:
+                return
+            key, category = found
+            removed = []
+            with self._saving(), self.storage.transaction():
+                for en in prompts_en:
+                    if category.remove_prompt(en):
+                        removed.append(en)
+                        self.storage.delete_prompt(key, en)
+            for en in removed:
+                self._notify(('delete_prompt', key, en))
     
     def save_library(self):
-        """保存提示词库到文件"""
+        """请求整体保存提示词库，JSON 库由后台线程写入"""
         try:
-            # 确保目标目录存在
-            os.makedirs(os.path.dirname(self.library_path), exist_ok=True)
-            with open(self.library_path, 'w', encoding='utf-8') as f:
-                json.dump(self.export_library(), f, 
-                         ensure_ascii=False, indent=4)
+            self.storage.schedule_save()
         except Exception as e:
             print(f"保存提示词库失败: {e}")
 
+    @property
+    def save_pending(self) -> bool:
+        """是否有尚未写入磁盘的修改"""
+        return self.storage.pending
+
+    @property
+    def save_error(self) -> Optional[Exception]:
+        """最近一次后台保存的错误，成功后清除"""
+        return self.storage.last_error
+
+    def flush(self) -> bool:
+        """等待所有修改写入磁盘，返回是否成功"""
+        return self.storage.flush()
+
+    def close(self):
+        """关闭存储后端，写入尚未落盘的修改"""
+        self.storage.close()
+
 # 创建全局实例
-PROMPT_LIBRARY = PromptLibrary() 
\ No newline at end of file
+PROMPT_LIBRARY = PromptLibrary()
+# 退出时写入尚未保存的修改
+atexit.register(PROMPT_LIBRARY.close) 
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""随提示词库逐条更新的索引基类
+
+搜索索引、补全索引和对照词典都以 (分类键, 英文) 为单位索引提示词，并应用
+PromptLibrary 的修改记录保持同步。记录的分派和每个分类已索引提示词的登记
+由基类完成，子类只实现插入和删除一条提示词。
+"""
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class RecordIndex:
+    """每个 (分类键, 英文) 对应一个条目的索引"""
+    def __init__(self):
+        # 分类键 -> {英文: 条目}，条目由 _insert 返回，删除时传回 _delete
+        self._prompts: Dict[str, Dict[str, Any]] = {}
+        # 是否处于 add_many 中，子类可以推迟到 _end_batch 中统一整理
+        self._batch = False
+
+    def __len__(self) -> int:
+        return sum(map(len, self._prompts.values()))
+
+    def _insert(self, key: str, en: str, zh: str) -> Optional[Any]:
+        """索引一条提示词并返回其条目，返回 None 表示不索引"""
+        raise NotImplementedError
+
+    def _delete(self, key: str, en: str, entry: Any):
+        """删除 _insert 索引的一条提示词"""
+        raise NotImplementedError
+
+    def _end_batch(self):
+        """add_many 添加完成后调用"""
+
+    def _after_remove(self):
+        """remove 和 remove_category 删除完成后调用"""
+
+    def add(self, key: str, en: str, zh: str):
+        """添加提示词，同一分类中重复的英文只索引第一条"""
+        prompts = self._prompts.setdefault(key, {})
+        if en in prompts:
+            return
+        entry = self._insert(key, en, zh)
+        if entry is not None:
+            prompts[en] = entry
+
+    def add_many(self, records: Iterable[Tuple[str, str, str]]):
+        """批量添加 (分类键, 英文, 中文)"""
+        self._batch = True
+        try:
+            for key, en, zh in records:
+                self.add(key, en, zh)
+        finally:
+            self._batch = False
+            self._end_batch()
+
+    def remove(self, key: str, en: str):
+        prompts = self._prompts.get(key)
+        if prompts is None or en not in prompts:
+            return
+        self._delete(key, en, prompts.pop(en))
+        self._after_remove()
+
+    def remove_category(self, key: str):
+        for en, entry in self._prompts.pop(key, {}).items():
+            self._delete(key, en, entry)
+        self._after_remove()
+
+    def update(self, key: str, en: str, zh: str):
+        """修改提示词的中文"""
+        self.remove(key, en)
+        self.add(key, en, zh)
+
+    def apply(self, record: tuple):
+        """应用 PromptLibrary 的一条修改记录"""
+        op, key = record[0], record[1]
+        if op == 'add_prompt':
+            self.add(key, record[2], record[3])
+        elif op == 'update_prompt':
+            self.update(key, record[2], record[3])
+        elif op == 'delete_prompt':
+            self.remove(key, record[2])
+        elif op == 'delete_category':
+            self.remove_category(key)
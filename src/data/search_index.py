@@ -0,0 +1,222 @@
+"""提示词库全文搜索索引
+
+英文按单词建立倒排表，查询词按前缀匹配：词表保持有序，前缀对应的单词
+通过二分查找得到。中文没有词边界，按单字和相邻两字建立倒排表。
+
+查询时先从候选最少的查询词取出文档，再逐个用原文核对其余查询词，
+凑够 limit 条结果即停止；所有查询词都很宽泛时改为对倒排表求交集。
+文档只保存分类序号以及英文和中文的引用（与提示词库共用字符串），
+删除的文档只留下占位，占位超过一半时整体重建。
+"""
+import re
+from array import array
+from bisect import bisect_left, insort
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+from .record_index import RecordIndex
+
+_WORD = re.compile(r'\w+')
+# 查询中的中文片段
+_CJK = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]')
+
+# 前缀上界，用于在有序词表中确定前缀范围
+_MAX_CHAR = chr(0x10FFFF)
+
+# 候选文档不超过该数量时逐个核对原文，否则先对倒排表求交集
+VERIFY_LIMIT = 1000
+# 不超过该长度的英文前缀缓存其候选文档集合
+SHORT_PREFIX = 2
+
+SearchResult = Tuple[str, str, str]
+
+
+def en_words(text: str) -> List[str]:
+    """英文提示词的单词，忽略大小写"""
+    return _WORD.findall(text.casefold())
+
+
+def zh_grams(text: str) -> set:
+    """中文的单字和相邻两字"""
+    text = ''.join(text.split()).casefold()
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class _Term:
+    """查询中的一个词"""
+    __slots__ = ('text', 'is_zh')
+
+    def __init__(self, text: str, is_zh: bool):
+        self.text = text
+        self.is_zh = is_zh
+
+    def matches(self, en: str, zh: str) -> bool:
+        if self.is_zh:
+            return self.text in ''.join(zh.split()).casefold()
+        return any(word.startswith(self.text) for word in en_words(en))
+
+
+def parse_query(query: str) -> List[_Term]:
+    """把查询拆成英文前缀词和中文片段"""
+    terms = []
+    for part in query.split():
+        if _CJK.search(part):
+            terms.append(_Term(part.casefold(), True))
+        else:
+            terms.extend(_Term(word, False) for word in en_words(part))
+    return terms
+
+
+class SearchIndex(RecordIndex):
+    """提示词倒排索引，每个 (分类键, 英文) 对应一个文档，条目为文档序号"""
+    def __init__(self):
+        super().__init__()
+        self._clear()
+
+    def _clear(self):
+        self._prompts = {}
+        # 文档序号 -> 分类序号、英文、中文，删除的文档英文和中文为 None
+        self._doc_categories = array('i')
+        self._doc_en: List[Optional[str]] = []
+        self._doc_zh: List[Optional[str]] = []
+        # 分类序号 <-> 分类键
+        self._category_keys: List[str] = []
+        self._category_ids: Dict[str, int] = {}
+        self._en_postings: Dict[str, array] = {}
+        self._zh_postings: Dict[str, array] = {}
+        # 有序英文词表，用于前缀查找
+        self._vocabulary: List[str] = []
+        # 短前缀 -> 候选文档集合，查询时按需建立
+        self._prefix_sets: Dict[str, set] = {}
+        self._removed = 0
+
+    def _insert(self, key: str, en: str, zh: str) -> int:
+        """写入倒排表，返回文档序号"""
+        doc_id = len(self._doc_en)
+        category = self._category_ids.get(key)
+        if category is None:
+            category = self._category_ids[key] = len(self._category_keys)
+            self._category_keys.append(key)
+        self._doc_categories.append(category)
+        self._doc_en.append(en)
+        self._doc_zh.append(zh)
+        en_postings = self._en_postings
+        prefix_sets = self._prefix_sets
+        for word in set(en_words(en)):
+            postings = en_postings.get(word)
+            if postings is None:
+                postings = en_postings[word] = array('i')
+                if self._batch:
+                    # 批量添加时词表在 _end_batch 中统一排序
+                    self._vocabulary.append(word)
+                else:
+                    insort(self._vocabulary, word)
+            postings.append(doc_id)
+            if prefix_sets:
+                for length in range(1, SHORT_PREFIX + 1):
+                    prefix_docs = prefix_sets.get(word[:length])
+                    if prefix_docs is not None:
+                        prefix_docs.add(doc_id)
+        zh_postings = self._zh_postings
+        for gram in zh_grams(zh):
+            postings = zh_postings.get(gram)
+            if postings is None:
+                postings = zh_postings[gram] = array('i')
+            postings.append(doc_id)
+        return doc_id
+
+    def _end_batch(self):
+        self._vocabulary.sort()
+
+    def _delete(self, key: str, en: str, doc_id: int):
+        self._doc_en[doc_id] = None
+        self._doc_zh[doc_id] = None
+        self._removed += 1
+
+    def _after_remove(self):
+        """占位过多时重建索引，均摊后每次删除仍为 O(1)"""
+        if self._removed * 2 <= len(self._doc_en):
+            return
+        keys, categories = self._category_keys, self._doc_categories
+        docs = zip(categories, self._doc_en, self._doc_zh)
+        self._clear()
+        self.add_many((keys[category], en, zh) for category, en, zh in docs
+                      if en is not None)
+
+    def _prefix_words(self, prefix: str) -> List[str]:
+        start = bisect_left(self._vocabulary, prefix)
+        end = bisect_left(self._vocabulary, prefix + _MAX_CHAR, start)
+        return self._vocabulary[start:end]
+
+    def _postings(self, term: _Term) -> List[array]:
+        """查询词对应的倒排表，候选文档为这些表的并集
+
+        英文返回所有以该前缀开头的单词的倒排表，完全匹配的单词排在前面；
+        中文只返回最短的一个两字倒排表，候选文档仍需核对原文。
+        """
+        if term.is_zh:
+            grams = ([term.text] if len(term.text) == 1 else
+                     [term.text[i:i + 2] for i in range(len(term.text) - 1)])
+            lists = [self._zh_postings.get(gram) for gram in grams]
+            if any(postings is None for postings in lists):
+                return []
+            return [min(lists, key=len)]
+
+        words = self._prefix_words(term.text)
+        if term.text in self._en_postings:
+            words.remove(term.text)
+            words.insert(0, term.text)
+        return [self._en_postings[word] for word in words]
+
+    def _doc_set(self, term: _Term, lists: List[array]):
+        """查询词候选文档的集合，短前缀的集合缓存起来并随添加更新"""
+        if term.is_zh or len(term.text) > SHORT_PREFIX:
+            return chain.from_iterable(lists)
+        docs = self._prefix_sets.get(term.text)
+        if docs is None:
+            docs = self._prefix_sets[term.text] = set(chain.from_iterable(lists))
+        return docs
+
+    def search(self, query: str, limit: int = 50) -> List[SearchResult]:
+        """返回同时匹配所有查询词的提示词 (分类键, 英文, 中文)"""
+        terms = parse_query(query)
+        if not terms:
+            return []
+        lookups = sorted(((sum(map(len, lists)), lists, term)
+                          for term in terms for lists in [self._postings(term)]),
+                         key=lambda lookup: lookup[0])
+        size, lists, first = lookups[0]
+        if not size:
+            return []
+
+        if len(lookups) > 1 and size > VERIFY_LIMIT:
+            # 所有查询词都很宽泛时逐个核对原文太慢，先对倒排表求交集
+            candidates = self._doc_set(first, lists)
+            if not isinstance(candidates, set):
+                candidates = set(candidates)
+            for _, other_lists, other in lookups[1:]:
+                candidates = candidates.intersection(self._doc_set(other, other_lists))
+                if not candidates:
+                    return []
+            doc_ids = sorted(candidates)
+            # 英文前缀的倒排表并集即为匹配结果，只有中文需要核对
+            verify = [term for term in terms if term.is_zh]
+        else:
+            doc_ids = chain.from_iterable(lists)
+            verify = [term for term in terms if term is not first or term.is_zh]
+
+        results = []
+        seen = set()
+        for doc_id in doc_ids:
+            en = self._doc_en[doc_id]
+            if en is None or doc_id in seen:
+                continue
+            seen.add(doc_id)
+            zh = self._doc_zh[doc_id]
+            if all(term.matches(en, zh) for term in verify):
+                key = self._category_keys[self._doc_categories[doc_id]]
+                results.append((key, en, zh))
+                if len(results) >= limit:
+                    break
+        return results
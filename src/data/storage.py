@@ -0,0 +1,645 @@
+"""提示词库存储后端"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from .binary_format import BinaryRange, MappedLibrary, write_binary_library
+from .json_stream import (ProgressCallback, PromptsRange, iter_library_records,
+                          write_library_json)
+from .library_index import (LAZY_LOAD_THRESHOLD, FileRangePrompts, IndexEntry,
+                            LazyPrompts, build_index, file_signature, index_path_for,
+                            load_index, save_index)
+from .library_writer import DebouncedWriter
+
+# 使用 SQLite 存储的文件扩展名，其余路径按 JSON 处理
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+# 使用内存映射二进制格式的文件扩展名
+BINARY_EXTENSIONS = ('.pmlib',)
+
+# 日志文件超过该大小（字节）时合并回主文件
+COMPACT_THRESHOLD = 1024 * 1024
+
+
+def write_atomic(path: str, write: Callable, lock=None,
+                 on_replaced: Optional[Callable] = None,
+                 before_replace: Optional[Callable] = None):
+    """先写临时文件并刷到磁盘，再替换目标文件，避免写入中断导致文件截断
+
+    write 接收以二进制方式打开的临时文件，其返回值作为本函数的返回值。
+    before_replace()、替换文件和随后的 on_replaced(返回值) 在持有 lock 期间执行。
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            result = write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        with lock or nullcontext():
+            if before_replace:
+                before_replace()
+            os.replace(tmp_path, path)
+            if on_replaced:
+                on_replaced(result)
+        return result
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def journal_record_to_op(record: dict) -> tuple:
+    """把日志中的一行记录转换为加载时使用的操作元组"""
+    op = record['op']
+    key = record['key']
+    if op == 'add_category':
+        return (op, key, record['name'], record['description'])
+    if op in ('add_prompt', 'update_prompt'):
+        return (op, key, record['en'], record['zh'])
+    if op == 'delete_prompt':
+        return (op, key, record['en'])
+    return (op, key)
+
+
+class LibraryStorage:
+    """存储后端基类
+
+    PromptLibrary 在内存中修改数据后调用对应的方法持久化，
+    后端可以选择只写入变更的部分或者整体重写。
+    """
+    def __init__(self, path: str, snapshot: Callable[[], dict]):
+        self.path = path
+        # 获取完整提示词库数据的回调，供需要整体重写的后端使用。
+        # 返回的提示词列表与内存中的数据相互独立，可以在其他线程中读取
+        self.snapshot = snapshot
+        # 内存数据与存储之间的锁，后台写入线程读取快照时持有
+        self.lock = threading.RLock()
+
+    @property
+    def pending(self) -> bool:
+        """是否有尚未写入的修改"""
+        return False
+
+    @property
+    def last_error(self) -> Optional[Exception]:
+        """最近一次后台写入的错误"""
+        return None
+
+    def load_records(self, progress: Optional[ProgressCallback] = None) -> Iterator[tuple]:
+        """逐条产出提示词库的内容，供 PromptLibrary 边读取边构建
+
+        记录与修改操作一一对应：('add_category', key, name, description)、
+        ('add_prompt', key, en, zh)、('update_prompt', key, en, zh)、
+        ('delete_category', key)、('delete_prompt', key, en)，以及按需加载的分类
+        ('lazy_prompts', key, LazyPrompts)。progress 以 (已完成, 总量) 调用。
+
+        调用方需要先 flush() 等待后台写入完成：调用时通常已持有存储锁，而写入
+        线程取快照时也需要该锁，在这里等待会造成死锁。
+        """
+        raise NotImplementedError
+
+    def save(self, data: Dict[str, dict]):
+        """整体保存提示词库"""
+        raise NotImplementedError
+
+    def schedule_save(self):
+        """请求整体保存，默认立即同步写入"""
+        self.save(self.snapshot())
+
+    def flush(self) -> bool:
+        """等待尚未完成的写入，返回是否全部成功"""
+        return True
+
+    def add_category(self, key: str, name: str, description: str):
+        raise NotImplementedError
+
+    def add_prompt(self, key: str, en: str, zh: str):
+        raise NotImplementedError
+
+    def update_prompt(self, key: str, en: str, zh: str):
+        """修改分类中所有英文为 en 的提示词的中文"""
+        raise NotImplementedError
+
+    def delete_category(self, key: str):
+        raise NotImplementedError
+
+    def delete_prompt(self, key: str, en: str):
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self):
+        """将多次修改合并为一次提交"""
+        yield
+
+    def close(self):
+        """释放后端占用的资源"""
+        pass
+
+
+class JsonStorage(LibraryStorage):
+    """JSON 文件存储，修改由后台线程合并后整体重写文件
+
+    超过 LAZY_LOAD_THRESHOLD 的文件启动时只读取偏移索引，
+    分类的提示词在第一次访问时才从文件中读取。
+    """
+    def __init__(self, path: str, snapshot: Callable[[], dict]):
+        super().__init__(path, snapshot)
+        self.writer = DebouncedWriter(self._write_snapshot)
+        # 分类键 -> 尚未加载的提示词，库文件重写后更新其字节区间
+        self._lazy: Dict[str, FileRangePrompts] = {}
+
+    @property
+    def pending(self) -> bool:
+        return self.writer.pending
+
+    @property
+    def last_error(self) -> Optional[Exception]:
+        return self.writer.last_error
+
+    def load_records(self, progress: Optional[ProgressCallback] = None) -> Iterator[tuple]:
+        return self._base_records(progress)
+
+    def _base_records(self, progress: Optional[ProgressCallback]) -> Iterator[tuple]:
+        """读取库文件，大文件只读取索引"""
+        self._lazy = {}
+        if os.path.getsize(self.path) < LAZY_LOAD_THRESHOLD:
+            yield from iter_library_records(self.path, progress)
+            return
+
+        entries = load_index(self.path)
+        if entries is None:
+            entries = build_index(self.path, progress)
+            try:
+                save_index(self.path, entries)
+            except OSError as e:
+                print(f"保存提示词库索引失败: {e}")
+        for entry in entries:
+            lazy = FileRangePrompts(self.path, entry.range, self.lock)
+            self._lazy[entry.key] = lazy
+            yield ('add_category', entry.key, entry.name, entry.description)
+            yield ('lazy_prompts', entry.key, lazy)
+
+    def save(self, data: Dict[str, dict]):
+        """整体写入库文件，未加载的分类直接复制原文件中的字节"""
+        has_ranges = any(isinstance(cat_data['prompts'], PromptsRange)
+                         for cat_data in data.values())
+        source = self.path if has_ranges else None
+        ranges = write_atomic(self.path,
+                              lambda f: write_library_json(f, data, source),
+                              self.lock, self._update_lazy_ranges)
+        entries = [IndexEntry(key, cat_data['name'], cat_data['description'], ranges[key])
+                   for key, cat_data in data.items()]
+        # 大文件或已有索引时同步更新索引，下次启动无需重新扫描
+        if (os.path.getsize(self.path) >= LAZY_LOAD_THRESHOLD
+                or os.path.exists(index_path_for(self.path))):
+            try:
+                save_index(self.path, entries)
+            except OSError as e:
+                print(f"保存提示词库索引失败: {e}")
+
+    def _update_lazy_ranges(self, ranges: Dict[str, PromptsRange]):
+        """库文件替换后，未加载的分类改为读取新文件中的区间"""
+        for key, lazy in self._lazy.items():
+            if key in ranges:
+                lazy.range = ranges[key]
+
+    def _write_snapshot(self):
+        """在写入线程中执行：取快照后整体写入"""
+        with self.lock:
+            data = self.snapshot()
+        self.save(data)
+
+    def add_category(self, key: str, name: str, description: str):
+        self.writer.mark_dirty()
+
+    def add_prompt(self, key: str, en: str, zh: str):
+        self.writer.mark_dirty()
+
+    def update_prompt(self, key: str, en: str, zh: str):
+        self.writer.mark_dirty()
+
+    def delete_category(self, key: str):
+        self.writer.mark_dirty()
+
+    def delete_prompt(self, key: str, en: str):
+        self.writer.mark_dirty()
+
+    def schedule_save(self):
+        self.writer.mark_dirty()
+
+    def flush(self) -> bool:
+        return self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+
+class SqliteStorage(LibraryStorage):
+    """SQLite 存储（WAL 模式），每次修改只写入单行"""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS categories (
+            key TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT NOT NULL DEFAULT '',
+            position INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS prompts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category_key TEXT NOT NULL,
+            en TEXT NOT NULL,
+            zh TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_prompts_category_en
+            ON prompts (category_key, en);
+    """
+
+    def __init__(self, path: str, snapshot: Callable[[], dict]):
+        super().__init__(path, snapshot)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 使用自动提交模式，由 transaction() 显式控制事务
+        self._conn = sqlite3.connect(path, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._depth = 0
+
+    def load_records(self, progress: Optional[ProgressCallback] = None) -> Iterator[tuple]:
+        for key, name, description in self._conn.execute(
+                "SELECT key, name, description FROM categories ORDER BY position"):
+            yield ('add_category', key, name, description)
+        total = self._conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+        cursor = self._conn.execute(
+            "SELECT category_key, en, zh FROM prompts ORDER BY id")
+        done = 0
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            for key, en, zh in rows:
+                yield ('add_prompt', key, en, zh)
+            done += len(rows)
+            if progress:
+                progress(done, total)
+
+    def save(self, data: Dict[str, dict]):
+        with self.transaction():
+            self._conn.execute("DELETE FROM prompts")
+            self._conn.execute("DELETE FROM categories")
+            for key, cat_data in data.items():
+                self.add_category(key, cat_data['name'], cat_data['description'])
+                self._conn.executemany(
+                    "INSERT INTO prompts (category_key, en, zh) VALUES (?, ?, ?)",
+                    ((key, p['en'], p['zh']) for p in cat_data['prompts']))
+
+    def add_category(self, key: str, name: str, description: str):
+        # 已存在的分类只更新名称和描述，与日志重放的行为一致
+        self._conn.execute(
+            "INSERT INTO categories (key, name, description, position) "
+            "VALUES (?, ?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM categories)) "
+            "ON CONFLICT (key) DO UPDATE SET name = excluded.name, "
+            "description = excluded.description",
+            (key, name, description))
+
+    def add_prompt(self, key: str, en: str, zh: str):
+        self._conn.execute(
+            "INSERT INTO prompts (category_key, en, zh) VALUES (?, ?, ?)",
+            (key, en, zh))
+
+    def update_prompt(self, key: str, en: str, zh: str):
+        self._conn.execute(
+            "UPDATE prompts SET zh = ? WHERE category_key = ? AND en = ?",
+            (zh, key, en))
+
+    def delete_category(self, key: str):
+        with self.transaction():
+            self._conn.execute("DELETE FROM prompts WHERE category_key = ?", (key,))
+            self._conn.execute("DELETE FROM categories WHERE key = ?", (key,))
+
+    def delete_prompt(self, key: str, en: str):
+        self._conn.execute(
+            "DELETE FROM prompts WHERE category_key = ? AND en = ?", (key, en))
+
+    @contextmanager
+    def transaction(self):
+        if self._depth == 0:
+            self._conn.execute("BEGIN")
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute("ROLLBACK")
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        self._conn.close()
+
+
+class JournalStorage(JsonStorage):
+    """JSON 文件加追加式修改日志
+
+    每次修改只在 ``<库文件>.journal`` 末尾追加一行记录，加载时先读取主文件
+    再重放日志。日志超过 COMPACT_THRESHOLD 后由后台写入线程合并回主文件。
+
+    合并开始时当前日志被重命名为 ``.compacting``，其首行记录了当时主文件的
+    签名；主文件替换完成后该日志被删除。如果中途退出，加载时根据签名判断
+    主文件是否已经包含这部分修改，从而避免重复重放。
+    """
+    def __init__(self, path: str, snapshot: Callable[[], dict],
+                 compact_threshold: int = COMPACT_THRESHOLD):
+        super().__init__(path, snapshot)
+        self.journal_path = f"{path}.journal"
+        self.compacting_path = f"{path}.compacting"
+        self.compact_threshold = compact_threshold
+        self._pending: List[str] = []
+        self._depth = 0
+
+    def _base_signature(self) -> Optional[dict]:
+        """主文件签名，用于判断合并是否已经完成
+
+        除大小和修改时间外还包括内容哈希和 inode 编号：修改时间精度较低的文件
+        系统上，合并替换主文件后大小和修改时间可能不变，而替换总会产生新的
+        inode，内容一般也会不同。
+        """
+        try:
+            signature = file_signature(self.path)
+            signature['ino'] = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+        return signature
+
+    @staticmethod
+    def _same_base(recorded, signature: Optional[dict]) -> bool:
+        """待合并日志记录的签名是否与当前主文件一致"""
+        if isinstance(recorded, list):
+            # 旧版本只记录了 [大小, 修改时间]
+            return signature is not None and recorded == [signature['size'],
+                                                          signature['mtime_ns']]
+        return recorded == signature
+
+    def _read_journal(self, path: str) -> List[dict]:
+        """读取日志文件，忽略写入中断留下的不完整末行"""
+        records = []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+        except FileNotFoundError:
+            pass
+        return records
+
+    def load_records(self, progress: Optional[ProgressCallback] = None) -> Iterator[tuple]:
+        # 先记录主文件签名，再决定是否重放待合并日志
+        base_signature = self._base_signature()
+        if base_signature is not None:
+            yield from self._base_records(progress)
+
+        compacting = self._read_journal(self.compacting_path)
+        if compacting:
+            header = compacting[0]
+            # 签名不一致说明主文件已经包含这部分修改
+            if self._same_base(header.get('base'), base_signature):
+                for record in compacting[1:]:
+                    yield journal_record_to_op(record)
+            else:
+                os.remove(self.compacting_path)
+
+        for record in self._read_journal(self.journal_path):
+            yield journal_record_to_op(record)
+
+        if self._journal_size() > self.compact_threshold:
+            self.writer.mark_dirty()
+
+    def _journal_size(self) -> int:
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def _append(self, record: dict):
+        self._pending.append(json.dumps(record, ensure_ascii=False) + '\n')
+        if not self._depth:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        """将缓冲的记录一次性追加到日志"""
+        if not self._pending:
+            return
+        directory = os.path.dirname(self.journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(self._pending))
+        self._pending = []
+        if self._journal_size() > self.compact_threshold:
+            self.writer.mark_dirty()
+
+    def add_category(self, key: str, name: str, description: str):
+        self._append({'op': 'add_category', 'key': key,
+                      'name': name, 'description': description})
+
+    def add_prompt(self, key: str, en: str, zh: str):
+        self._append({'op': 'add_prompt', 'key': key, 'en': en, 'zh': zh})
+
+    def update_prompt(self, key: str, en: str, zh: str):
+        self._append({'op': 'update_prompt', 'key': key, 'en': en, 'zh': zh})
+
+    def delete_category(self, key: str):
+        self._append({'op': 'delete_category', 'key': key})
+
+    def delete_prompt(self, key: str, en: str):
+        self._append({'op': 'delete_prompt', 'key': key, 'en': en})
+
+    @contextmanager
+    def transaction(self):
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+        if not self._depth:
+            self._flush_pending()
+
+    def _rotate_journal(self):
+        """把当前日志转为待合并日志，之后的修改写入新日志"""
+        if not os.path.exists(self.journal_path):
+            return
+        if os.path.exists(self.compacting_path):
+            # 上次合并失败，将新记录接在旧的待合并日志之后
+            with open(self.journal_path, 'r', encoding='utf-8') as src, \
+                    open(self.compacting_path, 'a', encoding='utf-8') as dst:
+                dst.write(src.read())
+            os.remove(self.journal_path)
+        else:
+            header = json.dumps({'base': self._base_signature()}) + '\n'
+            with open(self.journal_path, 'r', encoding='utf-8') as src, \
+                    open(self.compacting_path, 'w', encoding='utf-8') as dst:
+                dst.write(header)
+                dst.write(src.read())
+            os.remove(self.journal_path)
+
+    def _write_snapshot(self):
+        """在写入线程中执行：把日志合并回主文件"""
+        with self.lock:
+            data = self.snapshot()
+            self._rotate_journal()
+        self.save(data)
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+
+    def close(self):
+        """退出前把日志合并回主文件，保持 JSON 文件完整可读"""
+        with self.lock:
+            self._flush_pending()
+            if os.path.exists(self.journal_path) or os.path.exists(self.compacting_path):
+                self.writer.mark_dirty()
+        super().close()
+
+
+class MappedPrompts(LazyPrompts):
+    """二进制库文件中尚未解码的分类提示词"""
+    __slots__ = ('storage', 'range')
+
+    def __init__(self, storage: 'BinaryStorage', prompts_range: BinaryRange):
+        self.storage = storage
+        self.range = prompts_range
+
+    @property
+    def count(self) -> int:
+        return self.range.count
+
+    def load(self) -> List[Tuple[str, str]]:
+        return self.storage.read_prompts(self.range)
+
+    def snapshot(self) -> BinaryRange:
+        return self.range
+
+
+class BinaryStorage(LibraryStorage):
+    """内存映射的二进制文件存储，格式见 binary_format
+
+    打开时只读取分类表，分类的提示词在第一次访问时才从映射中解码。
+    修改由后台线程合并后整体重写文件，未加载的分类直接从旧文件复制。
+    """
+    def __init__(self, path: str, snapshot: Callable[[], dict]):
+        super().__init__(path, snapshot)
+        self.writer = DebouncedWriter(self._write_snapshot)
+        self._mapped: Optional[MappedLibrary] = None
+        # 分类键 -> 尚未加载的提示词，库文件重写后更新其位置
+        self._lazy: Dict[str, MappedPrompts] = {}
+
+    @property
+    def pending(self) -> bool:
+        return self.writer.pending
+
+    @property
+    def last_error(self) -> Optional[Exception]:
+        return self.writer.last_error
+
+    def load_records(self, progress: Optional[ProgressCallback] = None) -> Iterator[tuple]:
+        with self.lock:
+            self._unmap()
+            self._lazy = {}
+            # 新建的库在第一次保存时才创建文件
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                self._mapped = MappedLibrary(self.path)
+        if self._mapped is None:
+            return
+        total = self._mapped.category_count
+        for done, record in enumerate(self._mapped.categories(), 1):
+            yield ('add_category', record.key, record.name, record.description)
+            if record.range.count:
+                lazy = MappedPrompts(self, record.range)
+                self._lazy[record.key] = lazy
+                yield ('lazy_prompts', record.key, lazy)
+            if progress:
+                progress(done, total)
+
+    def read_prompts(self, prompts_range: BinaryRange) -> List[Tuple[str, str]]:
+        """从当前映射中解码提示词，持有存储锁以免与库文件替换同时进行"""
+        with self.lock:
+            return self._mapped.prompts(prompts_range)
+
+    def _unmap(self):
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+
+    def _remap(self, positions: Optional[Dict[str, BinaryRange]] = None):
+        """库文件替换后重新映射，未加载的分类改为读取新文件中的位置"""
+        self._unmap()
+        if os.path.exists(self.path):
+            self._mapped = MappedLibrary(self.path)
+        for key, lazy in self._lazy.items():
+            if positions and key in positions:
+                lazy.range = positions[key]
+
+    def save(self, data: Dict[str, dict]):
+        """整体写入库文件"""
+        try:
+            # 部分系统不能替换仍被映射的文件，替换前先解除映射
+            write_atomic(self.path,
+                         lambda f: write_binary_library(f, data, self._mapped),
+                         self.lock, self._remap, self._unmap)
+        except BaseException:
+            with self.lock:
+                if self._mapped is None:
+                    self._remap()
+            raise
+
+    def _write_snapshot(self):
+        """在写入线程中执行：取快照后整体写入"""
+        with self.lock:
+            data = self.snapshot()
+        self.save(data)
+
+    def add_category(self, key: str, name: str, description: str):
+        self.writer.mark_dirty()
+
+    def add_prompt(self, key: str, en: str, zh: str):
+        self.writer.mark_dirty()
+
+    def update_prompt(self, key: str, en: str, zh: str):
+        self.writer.mark_dirty()
+
+    def delete_category(self, key: str):
+        self.writer.mark_dirty()
+
+    def delete_prompt(self, key: str, en: str):
+        self.writer.mark_dirty()
+
+    def schedule_save(self):
+        self.writer.mark_dirty()
+
+    def flush(self) -> bool:
+        return self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+        with self.lock:
+            self._unmap()
+
+
+def create_storage(path: str, snapshot: Callable[[], dict]) -> LibraryStorage:
+    """根据文件扩展名选择存储后端"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in SQLITE_EXTENSIONS:
+        return SqliteStorage(path, snapshot)
+    if extension in BINARY_EXTENSIONS:
+        return BinaryStorage(path, snapshot)
+    return JournalStorage(path, snapshot)
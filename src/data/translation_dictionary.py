@@ -0,0 +1,137 @@
+"""由提示词库建立的中英对照词典
+
+英文 -> 中文按原文精确匹配时直接查找各分类已索引的提示词，中文 -> 英文
+使用一张按原文登记的表。两个方向另有一张按规范化文本（合并空白、忽略
+大小写、下划线视为空格）登记的表，只保存规范化后与原文不同的文本，
+与原文相同的文本查找时从精确匹配中取得。表中的字符串都引用提示词库中
+的字符串，每个原文只有一种翻译且只出现一次时不另建计数。
+
+同一原文在多个分类中有不同翻译时，使用出现次数最多的一个，次数相同时
+取先登记的一个。词库修改时逐条更新，不需要重建。
+"""
+from typing import Dict, Iterable, Optional, Union
+from .record_index import RecordIndex
+
+
+def normalize_entry(text: str) -> str:
+    """规范化查找使用的键"""
+    return ' '.join(text.replace('_', ' ').split()).casefold()
+
+
+def _most_common(counts: Dict[str, int]) -> Optional[str]:
+    if not counts:
+        return None
+    return max(counts, key=counts.__getitem__)
+
+
+class _Table:
+    """原文 -> 翻译，同一原文有多个翻译或出现多次时为 {翻译: 出现次数}"""
+    __slots__ = ('_entries',)
+
+    def __init__(self):
+        self._entries: Dict[str, Union[str, Dict[str, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, text: str, translation: str):
+        current = self._entries.get(text)
+        if current is None:
+            self._entries[text] = translation
+            return
+        if not isinstance(current, dict):
+            current = self._entries[text] = {current: 1}
+        current[translation] = current.get(translation, 0) + 1
+
+    def remove(self, text: str, translation: str):
+        current = self._entries.get(text)
+        if current is None:
+            return
+        if not isinstance(current, dict):
+            if current == translation:
+                del self._entries[text]
+            return
+        if translation not in current:
+            return
+        current[translation] -= 1
+        if not current[translation]:
+            del current[translation]
+        if not current:
+            del self._entries[text]
+        elif len(current) == 1:
+            (only, count), = current.items()
+            if count == 1:
+                self._entries[text] = only
+
+    def counts(self, text: str) -> Dict[str, int]:
+        """原文的各个翻译及其出现次数"""
+        current = self._entries.get(text)
+        if current is None:
+            return {}
+        if not isinstance(current, dict):
+            return {current: 1}
+        return current
+
+
+class TranslationDictionary(RecordIndex):
+    """双向对照词典，每个 (分类键, 英文) 对应一条词条，条目为中文"""
+    def __init__(self):
+        super().__init__()
+        # 中文 -> 英文
+        self._zh_table = _Table()
+        # 下标 0 为英文 -> 中文，1 为中文 -> 英文，只登记规范化后与原文不同的文本
+        self._normalized = (_Table(), _Table())
+
+    def _insert(self, key: str, en: str, zh: str) -> Optional[str]:
+        """中文为空的提示词不能用于翻译，跳过"""
+        if not zh.strip() or not en.strip():
+            return None
+        self._zh_table.add(zh, en)
+        for side, text, translation in ((0, en, zh), (1, zh, en)):
+            normalized = normalize_entry(text)
+            if normalized != text:
+                self._normalized[side].add(normalized, translation)
+        return zh
+
+    def _delete(self, key: str, en: str, zh: str):
+        self._zh_table.remove(zh, en)
+        for side, text, translation in ((0, en, zh), (1, zh, en)):
+            normalized = normalize_entry(text)
+            if normalized != text:
+                self._normalized[side].remove(normalized, translation)
+
+    def _exact_counts(self, text: str, side: int) -> Dict[str, int]:
+        """按原文精确匹配的翻译及其出现次数，英文在各分类中查找"""
+        if side:
+            return self._zh_table.counts(text)
+        counts = {}
+        for prompts in self._prompts.values():
+            zh = prompts.get(text)
+            if zh is not None:
+                counts[zh] = counts.get(zh, 0) + 1
+        return counts
+
+    def lookup(self, text: str, to_english: bool) -> Optional[str]:
+        """查找翻译，先精确匹配再按规范化文本匹配，找不到时返回 None"""
+        side = 1 if to_english else 0
+        translation = _most_common(self._exact_counts(text, side))
+        if translation is None and text.strip() != text:
+            translation = _most_common(self._exact_counts(text.strip(), side))
+        if translation is None:
+            normalized = normalize_entry(text)
+            # 规范化后与原文相同的文本只在精确匹配中登记，两部分合并计数
+            counts = dict(self._exact_counts(normalized, side))
+            for other, count in self._normalized[side].counts(normalized).items():
+                counts[other] = counts.get(other, 0) + count
+            translation = _most_common(counts)
+        return translation
+
+    def lookup_many(self, texts: Iterable[str], to_english: bool) -> Dict[str, str]:
+        """批量查找，返回找到的 {原文: 译文}"""
+        found = {}
+        for text in texts:
+            if text not in found:
+                translation = self.lookup(text, to_english)
+                if translation is not None:
+                    found[text] = translation
+        return found
@@ -1,14 +1,39 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTreeWidget, 
                           QTreeWidgetItem, QPushButton, QLabel, QHeaderView, QWidget, 
-                          QFileDialog, QLineEdit, QDialogButtonBox, QMessageBox)
-from PyQt6.QtCore import Qt, QPoint, pyqtSignal
+                          QFileDialog, QLineEdit, QDialogButtonBox, QMessageBox,
+                          QProgressDialog, QApplication, QInputDialog)
+from PyQt6.QtCore import Qt, QPoint, QTimer, pyqtSignal
 from PyQt6.QtGui import QIcon
-from ..data.prompt_library import PROMPT_LIBRARY
+from ..data.prompt_library import (PROMPT_LIBRARY, MERGE_FILL_EMPTY,
+                                   MERGE_KEEP_INCOMING, MERGE_KEEP_LOCAL)
+from ..data.binary_format import write_binary_library
+from ..data.storage import BINARY_EXTENSIONS, write_atomic
 from ..styles.prompt_library import *
 from ..styles.dialog_style import DIALOG_BASE_STYLE
 from .category_dialog import CategoryDialog
 from .prompt_edit_dialog import PromptEditDialog
 import json
+import os
+
+# 导入导出支持的格式
+LIBRARY_FILE_FILTER = "JSON Files (*.json);;提示词库二进制文件 (*.pmlib)"
+
+# 搜索时最多显示的结果数量
+SEARCH_LIMIT = 200
+# 搜索索引尚未建立完成时检查的间隔（毫秒）
+SEARCH_INDEX_POLL_INTERVAL = 200
+
+# 导入时英文重复的提示词的处理方式
+MERGE_POLICY_LABELS = {
+    "保留本地翻译": MERGE_KEEP_LOCAL,
+    "使用导入的翻译": MERGE_KEEP_INCOMING,
+    "仅补充空白翻译": MERGE_FILL_EMPTY,
+}
+
+
+def _is_binary_path(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in BINARY_EXTENSIONS
+
 
 class PromptLibraryDialog(QDialog):
     # 添加自定义信号
@@ -94,7 +119,24 @@ class PromptLibraryDialog(QDialog):
         self.tree.setSelectionMode(QTreeWidget.SelectionMode.NoSelection)
         self.tree.setStyleSheet(TREE_WIDGET_STYLE)
         
+        # 搜索框，输入时过滤列表
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索提示词…")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setStyleSheet(SEARCH_EDIT_STYLE)
+        self.search_edit.textChanged.connect(self._on_search_changed)
+        # 搜索索引在第一次使用时才建立，搜索框获得焦点时就开始
+        self.search_edit.focusInEvent = self._search_edit_focus_in
+        # 搜索时暂存分类列表，清空搜索后直接恢复而不重新创建
+        self._searching = False
+        self._browse_items = None
+        # 搜索索引在后台建立，完成前定时检查
+        self.search_index_timer = QTimer(self)
+        self.search_index_timer.setInterval(SEARCH_INDEX_POLL_INTERVAL)
+        self.search_index_timer.timeout.connect(self._on_search_index_timer)
+        
         # 加载提示词库
+        self.tree.itemExpanded.connect(self._on_item_expanded)
         self.load_library()
         
         # 按钮
@@ -108,6 +150,11 @@ class PromptLibraryDialog(QDialog):
             btn.setMinimumHeight(36)
             btn.setStyleSheet(ACTION_BUTTON_STYLE)
         
+        # 保存状态提示
+        self.save_status_label = QLabel()
+        self.save_status_label.setStyleSheet(SAVE_STATUS_STYLE)
+        button_layout.addWidget(self.save_status_label)
+        
         button_layout.addStretch()
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.cancel_button)
@@ -133,6 +180,7 @@ class PromptLibraryDialog(QDialog):
             toolbar_layout.addWidget(btn)
         
         toolbar_layout.addStretch()
+        toolbar_layout.addWidget(self.search_edit)
         
         # 连接信号
         self.import_button.clicked.connect(self._import_library)
@@ -160,6 +208,22 @@ class PromptLibraryDialog(QDialog):
         self._drag_pos = None
         title_bar.mousePressEvent = self._title_bar_mouse_press
         title_bar.mouseMoveEvent = self._title_bar_mouse_move
+        
+        # 定时刷新后台保存状态
+        self.save_status_timer = QTimer(self)
+        self.save_status_timer.timeout.connect(self._update_save_status)
+        self.save_status_timer.start(300)
+    
+    def _update_save_status(self):
+        """显示提示词库的后台保存状态"""
+        if PROMPT_LIBRARY.save_pending:
+            self.save_status_label.setStyleSheet(SAVE_STATUS_STYLE)
+            self.save_status_label.setText("正在保存…")
+        elif PROMPT_LIBRARY.save_error:
+            self.save_status_label.setStyleSheet(SAVE_ERROR_STYLE)
+            self.save_status_label.setText(f"保存失败: {PROMPT_LIBRARY.save_error}")
+        else:
+            self.save_status_label.setText("")
     
     def _title_bar_mouse_press(self, event):
         """记录鼠标按下位置"""
@@ -171,25 +235,126 @@ class PromptLibraryDialog(QDialog):
         if event.buttons() & Qt.MouseButton.LeftButton and self._drag_pos:
             self.move(event.globalPosition().toPoint() - self._drag_pos)
     
+    def _search_edit_focus_in(self, event):
+        """搜索框获得焦点时在后台开始建立搜索索引"""
+        PROMPT_LIBRARY.prepare_search()
+        QLineEdit.focusInEvent(self.search_edit, event)
+    
     def load_library(self):
-        """加载提示词库到树形控件"""
-        for category_key, category in PROMPT_LIBRARY.categories.items():
-            # 创建分类项
-            category_item = QTreeWidgetItem([category.name, category.description])
-            category_item.setFlags(category_item.flags() | 
-                                 Qt.ItemFlag.ItemIsAutoTristate | 
-                                 Qt.ItemFlag.ItemIsUserCheckable)
-            self.tree.addTopLevelItem(category_item)
-            
-            # 添加提示词
-            for prompt in category.prompts:
-                prompt_item = QTreeWidgetItem([prompt["en"], prompt["zh"]])
-                prompt_item.setFlags(prompt_item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
-                prompt_item.setCheckState(0, Qt.CheckState.Unchecked)
-                category_item.addChild(prompt_item)
-            
-            # 默认展开分类
-            category_item.setExpanded(True)
+        """加载提示词库到树形控件，有搜索内容时只显示搜索结果"""
+        if self.search_edit.text().strip():
+            # 提示词库已经修改，暂存的分类列表不再可用
+            self._browse_items = None
+            self._searching = True
+            self._show_search_results(self.search_edit.text())
+            return
+        self._searching = False
+        for key, category in PROMPT_LIBRARY.categories.items():
+            self._add_category_item(key, category)
+    
+    def _load_search_results(self, query):
+        """按分类显示搜索结果"""
+        category_items = {}
+        for key, en, zh in PROMPT_LIBRARY.search(query, SEARCH_LIMIT):
+            category_item = category_items.get(key)
+            if category_item is None:
+                category = PROMPT_LIBRARY.categories[key]
+                category_item = QTreeWidgetItem([category.name, category.description])
+                category_item.setFlags(category_item.flags() | 
+                                     Qt.ItemFlag.ItemIsAutoTristate | 
+                                     Qt.ItemFlag.ItemIsUserCheckable)
+                category_item.setData(0, Qt.ItemDataRole.UserRole, key)
+                self.tree.addTopLevelItem(category_item)
+                category_item.setExpanded(True)
+                category_items[key] = category_item
+            prompt_item = QTreeWidgetItem([en, zh])
+            prompt_item.setFlags(prompt_item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            prompt_item.setCheckState(0, Qt.CheckState.Unchecked)
+            category_item.addChild(prompt_item)
+    
+    def _show_search_results(self, query):
+        """显示搜索结果，搜索索引尚未建立完成时先显示提示"""
+        if PROMPT_LIBRARY.search_ready:
+            self.search_index_timer.stop()
+            self._load_search_results(query)
+            return
+        item = QTreeWidgetItem(["正在建立搜索索引…", ""])
+        item.setFlags(Qt.ItemFlag.NoItemFlags)
+        self.tree.addTopLevelItem(item)
+        self.search_index_timer.start()
+    
+    def _on_search_index_timer(self):
+        """搜索索引建立完成后显示当前搜索的结果"""
+        if not PROMPT_LIBRARY.search_ready:
+            return
+        self.search_index_timer.stop()
+        if self._searching:
+            self.tree.clear()
+            self._load_search_results(self.search_edit.text())
+    
+    def _on_search_changed(self, text):
+        """搜索内容变化时刷新列表，清空搜索时恢复之前的分类列表"""
+        if text.strip():
+            if not self._searching:
+                # 保留分类列表项及其展开状态
+                root = self.tree.invisibleRootItem()
+                expanded = [item.isExpanded() for item in
+                            map(root.child, range(root.childCount()))]
+                self._browse_items = (root.takeChildren(), expanded)
+                self._searching = True
+            self.tree.clear()
+            self._show_search_results(text)
+            return
+        if not self._searching:
+            return
+        self._searching = False
+        self.search_index_timer.stop()
+        self.tree.clear()
+        if self._browse_items is None:
+            self.load_library()
+            return
+        items, expanded = self._browse_items
+        self._browse_items = None
+        self.tree.addTopLevelItems(items)
+        for item, was_expanded in zip(items, expanded):
+            item.setExpanded(was_expanded)
+    
+    def _add_category_item(self, key, category):
+        """添加一个分类到树形控件，未加载的分类在展开时再读取提示词"""
+        # 创建分类项
+        category_item = QTreeWidgetItem([category.name, category.description])
+        category_item.setFlags(category_item.flags() | 
+                             Qt.ItemFlag.ItemIsAutoTristate | 
+                             Qt.ItemFlag.ItemIsUserCheckable)
+        category_item.setData(0, Qt.ItemDataRole.UserRole, key)
+        self.tree.addTopLevelItem(category_item)
+        
+        if not category.is_loaded:
+            category_item.setChildIndicatorPolicy(
+                QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator)
+            return
+        
+        self._add_prompt_items(category_item, category)
+        # 默认展开分类
+        category_item.setExpanded(True)
+    
+    def _add_prompt_items(self, category_item, category):
+        """添加分类下的提示词"""
+        for prompt in category.prompts:
+            prompt_item = QTreeWidgetItem([prompt["en"], prompt["zh"]])
+            prompt_item.setFlags(prompt_item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            prompt_item.setCheckState(0, Qt.CheckState.Unchecked)
+            category_item.addChild(prompt_item)
+    
+    def _on_item_expanded(self, item):
+        """展开尚未加载的分类时读取其提示词"""
+        if item.parent() or item.childCount():
+            return
+        category = PROMPT_LIBRARY.categories.get(item.data(0, Qt.ItemDataRole.UserRole))
+        if category is not None:
+            self._add_prompt_items(item, category)
+        item.setChildIndicatorPolicy(
+            QTreeWidgetItem.ChildIndicatorPolicy.DontShowIndicatorWhenChildless)
     
     def get_selected_prompts(self):
         """获取选中的提示词"""
@@ -239,30 +404,41 @@ class PromptLibraryDialog(QDialog):
         return msg.exec() == QMessageBox.StandardButton.Yes
 
     def _import_library(self):
-        """导入提示词库"""
+        """导入提示词库，已有的提示词按所选策略合并"""
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "导入提示词库", "", "JSON Files (*.json)")
-        if file_path:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                PROMPT_LIBRARY.merge_library(data)
-                self.tree.clear()
-                self.load_library()
-                self._show_message("成功", "提示词库导入成功")
-            except Exception as e:
-                self._show_message("错误", f"导入失败: {str(e)}", 
-                                 QMessageBox.Icon.Warning)
+            self, "导入提示词库", "", LIBRARY_FILE_FILTER)
+        if not file_path:
+            return
+        label, ok = QInputDialog.getItem(
+            self, "导入提示词库", "已存在的提示词:",
+            list(MERGE_POLICY_LABELS), 0, False)
+        if not ok:
+            return
+        try:
+            summary = PROMPT_LIBRARY.merge_library_file(
+                file_path, MERGE_POLICY_LABELS[label])
+            self.tree.clear()
+            self.load_library()
+            self._show_message(
+                "成功",
+                f"提示词库导入成功\n新增 {summary.added} 条，"
+                f"更新 {summary.updated} 条，跳过 {summary.skipped} 条")
+        except Exception as e:
+            self._show_message("错误", f"导入失败: {str(e)}", 
+                             QMessageBox.Icon.Warning)
     
     def _export_library(self):
         """导出提示词库"""
         file_path, _ = QFileDialog.getSaveFileName(
-            self, "导出提示词库", "", "JSON Files (*.json)")
+            self, "导出提示词库", "", LIBRARY_FILE_FILTER)
         if file_path:
             try:
                 data = PROMPT_LIBRARY.export_library()
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=4)
+                if _is_binary_path(file_path):
+                    write_atomic(file_path, lambda f: write_binary_library(f, data))
+                else:
+                    with open(file_path, 'w', encoding='utf-8') as f:
+                        json.dump(data, f, ensure_ascii=False, indent=4)
                 QMessageBox.information(self, "成功", "提示词库导出成功")
             except Exception as e:
                 QMessageBox.warning(self, "错误", f"导出失败: {str(e)}")
@@ -316,6 +492,30 @@ class PromptLibraryDialog(QDialog):
         if dialog.exec() == QDialog.DialogCode.Accepted:
             new_path = dialog.get_library_path()
             if new_path != PROMPT_LIBRARY.library_path:
-                PROMPT_LIBRARY.set_library_path(new_path)
-                self.tree.clear()
-                self.load_library() 
\ No newline at end of file
+                self._switch_library(new_path)
+    
+    def _switch_library(self, path: str):
+        """切换提示词库，加载过程中显示进度并逐步填充列表"""
+        self.tree.clear()
+        progress_dialog = QProgressDialog("正在加载提示词库…", None, 0, 100, self)
+        progress_dialog.setWindowTitle("加载")
+        progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(300)
+        progress_dialog.setStyleSheet(DIALOG_BASE_STYLE)
+        shown = 0
+        
+        def on_progress(done, total):
+            nonlocal shown
+            progress_dialog.setValue(int(done * 100 / total) if total else 100)
+            # 最后一个分类可能还在读取，只显示之前已经完整的分类
+            categories = list(PROMPT_LIBRARY.categories.items())[:-1]
+            for key, category in categories[shown:]:
+                self._add_category_item(key, category)
+            shown = max(shown, len(categories))
+            QApplication.processEvents()
+        
+        PROMPT_LIBRARY.set_library_path(path, on_progress)
+        progress_dialog.close()
+        # 加载结束后按最终内容重建（日志重放可能修改已显示的分类）
+        self.tree.clear()
+        self.load_library()
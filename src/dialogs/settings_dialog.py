@@ -2,6 +2,7 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                           QLineEdit, QPushButton, QFileDialog, QDialogButtonBox, 
                           QMessageBox, QCheckBox)
 from ..styles.dialog_style import DIALOG_BASE_STYLE
+from ..data.storage import BINARY_EXTENSIONS, SQLITE_EXTENSIONS
 import json
 import os
 from datetime import datetime
@@ -54,12 +55,15 @@ class SettingsDialog(QDialog):
             self, 
             "选择提示词库文件", 
             current_dir,
-            "JSON Files (*.json)",
+            "提示词库 (*.json *.db *.sqlite *.sqlite3 *.pmlib)",
             options=QFileDialog.Option.DontConfirmOverwrite
         )
         
         if file_path:
-            if not os.path.exists(file_path):
+            # SQLite 和二进制库文件由存储后端创建
+            extension = os.path.splitext(file_path)[1].lower()
+            is_json = extension not in SQLITE_EXTENSIONS + BINARY_EXTENSIONS
+            if not os.path.exists(file_path) and is_json:
                 try:
                     with open(file_path, 'w', encoding='utf-8') as f:
                         json.dump({}, f, ensure_ascii=False, indent=4)
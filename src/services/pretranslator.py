@@ -0,0 +1,69 @@
+"""输入时的预翻译
+
+用户输入提示词时，把新出现的中文片段提前翻译并写入翻译缓存，生成提示词
+列表时即可直接从缓存取得结果。正在翻译的片段不会重复提交；片段在翻译
+开始前被删除时跳过，整批都被删除时取消该批。
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+from .translator import TranslationService, get_translation_service
+
+
+class Pretranslator:
+    def __init__(self, service: Optional[TranslationService] = None,
+                 to_english: bool = True):
+        # 未指定时每批翻译都使用当时的共用翻译服务
+        self.service = service
+        self.to_english = to_english
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='pretranslate')
+        # 取消任务时回调在持有锁的线程中立即执行，因此使用可重入锁
+        self._lock = threading.RLock()
+        # 当前输入中的片段
+        self._wanted: Set[str] = set()
+        # 已翻译（结果在缓存中）和正在翻译的片段
+        self._done: Set[str] = set()
+        self._in_flight: Set[str] = set()
+        self._pending: Dict[Future, List[str]] = {}
+
+    def update(self, segments: Iterable[str]):
+        """以当前输入中的片段调用，只提交新出现的片段"""
+        segments = list(dict.fromkeys(segments))
+        with self._lock:
+            self._wanted = set(segments)
+            self._done &= self._wanted
+            for future, texts in list(self._pending.items()):
+                if self._wanted.isdisjoint(texts):
+                    # 成功取消时由 _finished 移出正在翻译的片段
+                    future.cancel()
+            new = [text for text in segments
+                   if text not in self._done and text not in self._in_flight]
+            if not new:
+                return
+            self._in_flight.update(new)
+            future = self._executor.submit(self._translate, new)
+            self._pending[future] = new
+        future.add_done_callback(self._finished)
+
+    def _translate(self, texts: List[str]) -> List[str]:
+        """翻译仍在输入中的片段，返回得到译文的片段"""
+        with self._lock:
+            texts = [text for text in texts if text in self._wanted]
+        if not texts:
+            return []
+        service = self.service if self.service is not None else get_translation_service()
+        # 熔断或请求失败时译文为空，这些片段不算已翻译，下次输入时重新提交
+        results = service.batch_translate(texts, self.to_english)
+        return [text for text, result in zip(texts, results) if result]
+
+    def _finished(self, future: Future):
+        with self._lock:
+            self._in_flight.difference_update(self._pending.pop(future, ()))
+            if not future.cancelled() and future.exception() is None:
+                self._done.update(future.result())
+
+    def close(self):
+        with self._lock:
+            for future in self._pending:
+                future.cancel()
+        self._executor.shutdown(wait=False)
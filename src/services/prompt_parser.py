@@ -0,0 +1,492 @@
+"""Stable Diffusion 提示词语法解析
+
+支持的语法：
+
+    (text)  (text:1.2)  [text]      权重分组
+    [a|b|c]                         交替
+    [from:to:0.5]  [to:0.5]         调度
+    <lora:name:0.8>                 LoRA、超网络等附加网络
+    embedding:name                  嵌入
+    BREAK                           分段
+    \\( \\) \\[ \\] \\: \\\\       转义
+
+正则表达式把文本切分为记号后单遍扫描，未闭合或不匹配的括号按普通文本处理，
+整体为线性时间。语法树只记录各节点在原文中的位置，按顺序拼接顶层节点的原文
+即得到原始文本，可以无损还原。IncrementalParser 在文本修改后只重新解析修改处
+所在的提示词。
+"""
+import re
+from bisect import bisect_left
+from typing import List, NamedTuple, Optional, Tuple
+
+# 记号：普通文本、转义、附加网络或单个特殊字符，依次覆盖整个原文
+_TOKEN = re.compile(r'[^\\()\[\]|:,，<]+|\\.|<[A-Za-z_][\w-]*:[^<>]*>|.', re.DOTALL)
+_SPECIAL = frozenset('\\()[]|:,，<')
+_EMBEDDING = re.compile(r'embedding:[^\s,，()\[\]|:<>\\]+')
+_BREAK = re.compile(r'(?<![^\s,，])BREAK(?![^\s,，])')
+_NUMBER = re.compile(r'\s*[+-]?(?:\d+\.?\d*|\.\d+)\s*$')
+
+# 圆括号和方括号的默认权重倍数
+EMPHASIS = 1.1
+
+
+class Node:
+    """语法树节点，start、end 为在原文中的位置"""
+    __slots__ = ('start', 'end')
+
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.end = end
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.start}, {self.end})"
+
+
+class Text(Node):
+    """普通文本，可能含有转义字符"""
+    __slots__ = ()
+
+
+class Separator(Node):
+    """逗号（包括全角逗号）"""
+    __slots__ = ()
+
+
+class Break(Node):
+    """BREAK 关键字"""
+    __slots__ = ()
+
+
+class Embedding(Node):
+    """embedding:name"""
+    __slots__ = ('name',)
+
+    def __init__(self, start: int, end: int, name: str):
+        super().__init__(start, end)
+        self.name = name
+
+
+class ExtraNetwork(Node):
+    """<kind:name:参数...>，如 LoRA"""
+    __slots__ = ('kind', 'name', 'args')
+
+    def __init__(self, start: int, end: int, kind: str, name: str, args: List[str]):
+        super().__init__(start, end)
+        self.kind = kind
+        self.name = name
+        self.args = args
+
+
+class WeightGroup(Node):
+    """(text)、(text:1.2) 或 [text]，weight 为显式写出的权重"""
+    __slots__ = ('bracket', 'children', 'weight')
+
+    def __init__(self, start: int, end: int, bracket: str, children: List[Node],
+                 weight: Optional[str] = None):
+        super().__init__(start, end)
+        self.bracket = bracket
+        self.children = children
+        self.weight = weight
+
+    @property
+    def multiplier(self) -> float:
+        if self.weight is not None:
+            return float(self.weight)
+        return EMPHASIS if self.bracket == '(' else 1 / EMPHASIS
+
+
+class Alternation(Node):
+    """[a|b|c]"""
+    __slots__ = ('options',)
+
+    def __init__(self, start: int, end: int, options: List[List[Node]]):
+        super().__init__(start, end)
+        self.options = options
+
+
+class Scheduling(Node):
+    """[from:to:step]，from 可以省略"""
+    __slots__ = ('before', 'after', 'step')
+
+    def __init__(self, start: int, end: int, before: Optional[List[Node]],
+                 after: List[Node], step: str):
+        super().__init__(start, end)
+        self.before = before
+        self.after = after
+        self.step = step
+
+
+class Prompt:
+    """解析结果，children 为按顺序覆盖整个原文的顶层节点"""
+    __slots__ = ('source', 'children')
+
+    def __init__(self, source: str, children: List[Node]):
+        self.source = source
+        self.children = children
+
+    def raw(self, node: Node) -> str:
+        return self.source[node.start:node.end]
+
+    def to_source(self) -> str:
+        return ''.join(self.source[node.start:node.end] for node in self.children)
+
+
+class _Frame:
+    """解析中尚未闭合的括号"""
+    __slots__ = ('start', 'bracket', 'nodes', 'colons', 'bars')
+
+    def __init__(self, start: int, bracket: str):
+        self.start = start
+        self.bracket = bracket
+        self.nodes: List[Node] = []
+        # 直接位于该括号内的冒号和竖线在 nodes 中的下标
+        self.colons: List[int] = []
+        self.bars: List[int] = []
+
+
+def _split(nodes: List[Node], indexes: List[int]) -> List[List[Node]]:
+    parts = []
+    last = 0
+    for index in indexes:
+        parts.append(nodes[last:index])
+        last = index + 1
+    parts.append(nodes[last:])
+    return parts
+
+
+def _number(source: str, nodes: List[Node]) -> Optional[str]:
+    """nodes 的原文为数字时返回去掉空白的数字"""
+    if not nodes:
+        return None
+    text = source[nodes[0].start:nodes[-1].end]
+    if _NUMBER.match(text):
+        return text.strip()
+    return None
+
+
+def _close(source: str, frame: _Frame, end: int) -> Node:
+    """根据括号内的冒号和竖线确定节点类型"""
+    nodes = frame.nodes
+    if frame.bracket == '(':
+        if frame.colons:
+            colon = frame.colons[-1]
+            weight = _number(source, nodes[colon + 1:])
+            if weight is not None:
+                return WeightGroup(frame.start, end, '(', nodes[:colon], weight)
+        return WeightGroup(frame.start, end, '(', nodes)
+    if frame.bars:
+        return Alternation(frame.start, end, _split(nodes, frame.bars))
+    if 1 <= len(frame.colons) <= 2:
+        parts = _split(nodes, frame.colons)
+        step = _number(source, parts[-1])
+        if step is not None:
+            before = parts[0] if len(parts) == 3 else None
+            return Scheduling(frame.start, end, before, parts[-2], step)
+    return WeightGroup(frame.start, end, '[', nodes)
+
+
+def _break_nodes(source: str, start: int, end: int) -> List[Node]:
+    """顶层文本中的 BREAK 关键字单独作为节点"""
+    nodes: List[Node] = []
+    pos = start
+    for match in _BREAK.finditer(source, start, end):
+        if match.start() > pos:
+            nodes.append(Text(pos, match.start()))
+        nodes.append(Break(match.start(), match.end()))
+        pos = match.end()
+    if pos < end:
+        nodes.append(Text(pos, end))
+    return nodes
+
+
+def _parse(source: str, pos: int, endpos: int) -> Tuple[List[Node], List[int]]:
+    """解析 source[pos:endpos]，返回顶层节点以及未闭合括号和单独的 < 的位置"""
+    root: List[Node] = []
+    # 单独的 < 在后面出现 > 时可能成为附加网络
+    unclosed: List[int] = []
+    stack: List[_Frame] = []
+    nodes = root
+    end = pos
+    # 嵌入跨越多个记号，被嵌入覆盖的记号跳过
+    skip_to = 0
+    for token in _TOKEN.findall(source, pos, endpos):
+        start = end
+        end += len(token)
+        if end <= skip_to:
+            continue
+        if start < skip_to:
+            start = skip_to
+            token = source[start:end]
+        first = token[0]
+        if first == ',' or first == '，':
+            nodes.append(Separator(start, end))
+        elif first not in _SPECIAL:
+            if not stack and 'BREAK' in token:
+                nodes.extend(_break_nodes(source, start, end))
+            else:
+                nodes.append(Text(start, end))
+        elif first == '(' or first == '[':
+            stack.append(_Frame(start, first))
+            nodes = stack[-1].nodes
+        elif first == ')' or first == ']':
+            if stack and (stack[-1].bracket == '(') == (first == ')'):
+                node = _close(source, stack.pop(), end)
+                nodes = stack[-1].nodes if stack else root
+                nodes.append(node)
+            else:
+                nodes.append(Text(start, end))
+        elif first == '<' and len(token) > 1:
+            kind, _, rest = token[1:-1].partition(':')
+            name, *args = rest.split(':')
+            nodes.append(ExtraNetwork(start, end, kind, name, args))
+        elif first == ':' and nodes and type(nodes[-1]) is Text and \
+                source.endswith('embedding', nodes[-1].start, start):
+            embedding = _EMBEDDING.match(source, start - len('embedding'))
+            if embedding is None:
+                nodes.append(Text(start, end))
+                if stack:
+                    stack[-1].colons.append(len(nodes) - 1)
+                continue
+            previous = nodes.pop()
+            if previous.start < embedding.start():
+                nodes.append(Text(previous.start, embedding.start()))
+            nodes.append(Embedding(embedding.start(), embedding.end(),
+                                   embedding.group()[len('embedding:'):]))
+            skip_to = embedding.end()
+        elif first == ':' or first == '|':
+            # 冒号和竖线先作为文本保存，闭合括号时再决定其含义
+            if stack:
+                (stack[-1].colons if first == ':' else stack[-1].bars).append(len(nodes))
+            nodes.append(Text(start, end))
+        else:
+            # 转义字符和不构成附加网络的 <
+            if first == '<':
+                unclosed.append(start)
+            nodes.append(Text(start, end))
+
+    # 未闭合的括号按普通文本处理，内容并入外层
+    if stack:
+        unclosed = sorted(unclosed + [frame.start for frame in stack])
+    while stack:
+        frame = stack.pop()
+        outer = stack[-1].nodes if stack else root
+        outer.append(Text(frame.start, frame.start + 1))
+        outer.extend(frame.nodes)
+    return root, unclosed
+
+
+def parse_prompt(source: str) -> Prompt:
+    """解析提示词，返回语法树"""
+    return Prompt(source, _parse(source, 0, len(source))[0])
+
+
+class PromptItem(NamedTuple):
+    """列表中的一个提示词
+
+    source 为原文（去掉首尾空白），start、end 为其在原文中的位置；
+    text 为去掉外层权重括号后的文本，weight 为合并后的权重。
+    """
+    source: str
+    text: str
+    weight: str
+    start: int
+    end: int
+
+
+def format_weight(weight: float) -> str:
+    return f"{round(weight, 4):g}"
+
+
+def _trim(source: str, nodes: List[Node], lo: int, hi: int):
+    """去掉 nodes[lo:hi] 首尾只有空白的文本节点"""
+    while lo < hi and type(nodes[lo]) is Text and source[nodes[lo].start:nodes[lo].end].isspace():
+        lo += 1
+    while hi > lo and type(nodes[hi - 1]) is Text and \
+            source[nodes[hi - 1].start:nodes[hi - 1].end].isspace():
+        hi -= 1
+    return lo, hi
+
+
+def _item(source: str, nodes: List[Node], lo: int, hi: int) -> Optional[PromptItem]:
+    if lo == hi:
+        return None
+    start = nodes[lo].start
+    raw = source[start:nodes[hi - 1].end]
+    text = raw.strip()
+    if not text:
+        return None
+    if len(text) != len(raw):
+        start += len(raw) - len(raw.lstrip())
+    end = start + len(text)
+    if text[-1] not in ')]':
+        return PromptItem(text, text, "1", start, end)
+
+    # 整个提示词只有一个权重分组时展开，嵌套的权重相乘
+    groups = []
+    lo, hi = _trim(source, nodes, lo, hi)
+    while hi - lo == 1 and type(nodes[lo]) is WeightGroup:
+        groups.append(nodes[lo])
+        nodes = nodes[lo].children
+        lo, hi = _trim(source, nodes, 0, len(nodes))
+    if not groups:
+        return PromptItem(text, text, "1", start, end)
+    if len(groups) == 1 and groups[0].weight is not None:
+        # 只有一层时保留原文中写出的权重
+        weight = groups[0].weight
+    else:
+        product = 1.0
+        for group in groups:
+            product *= group.multiplier
+        weight = format_weight(product)
+    inner = source[nodes[lo].start:nodes[hi - 1].end].strip() if lo < hi else ""
+    return PromptItem(text, inner, weight, start, end)
+
+
+def prompt_items(prompt: Prompt) -> List[PromptItem]:
+    """按顶层逗号和 BREAK 把提示词分为列表项"""
+    return _items(prompt.source, prompt.children)
+
+
+def _items(source: str, nodes: List[Node]) -> List[PromptItem]:
+    items = []
+    lo = 0
+    for index, node in enumerate(nodes):
+        kind = type(node)
+        if kind is Separator or kind is Break:
+            item = _item(source, nodes, lo, index)
+            if item is not None:
+                items.append(item)
+            lo = index + 1
+            if kind is Break:
+                items.append(PromptItem('BREAK', 'BREAK', "1", node.start, node.end))
+    item = _item(source, nodes, lo, len(nodes))
+    if item is not None:
+        items.append(item)
+    return items
+
+
+def format_item(text: str, weight: str) -> str:
+    """把文本和权重写回提示词语法"""
+    if weight and weight != "1":
+        return f"({text}:{weight})"
+    return text
+
+
+
+def common_affixes(old: str, new: str) -> Tuple[int, int]:
+    """公共前缀和后缀的长度，两者之和不超过较短的字符串
+
+    二分查找比较切片，逐字符比较只在 C 中进行。
+    """
+    limit = min(len(old), len(new))
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[lo:mid] == new[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    prefix = lo
+    lo, hi = 0, limit - prefix
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[len(old) - mid:len(old) - lo] == new[len(new) - mid:len(new) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return prefix, lo
+
+
+def _item_end(item: PromptItem) -> int:
+    return item.end
+
+
+def _has_separator(source: str, start: int, end: int) -> bool:
+    return source.find(',', start, end) >= 0 or source.find('，', start, end) >= 0
+
+
+def _ends_with_separator(source: str, nodes: List[Node], position: int) -> bool:
+    """nodes 是否以 position 之后的逗号结尾（之后只有空白）"""
+    for node in reversed(nodes):
+        if type(node) is Separator:
+            return node.start >= position
+        if type(node) is not Text or not source[node.start:node.end].isspace():
+            return False
+    return False
+
+
+class IncrementalParser:
+    """保存当前文本的列表项，文本修改后只重新解析修改处所在的提示词
+
+    列表项之间隔着顶层的逗号，逗号之后的括号状态总是为空，因此修改处前后
+    各自以逗号为界的部分可以直接沿用原来的列表项。
+    """
+    def __init__(self, source: str = ""):
+        self.reset(source)
+
+    def reset(self, source: str):
+        """完整解析 source"""
+        nodes, self._unclosed = _parse(source, 0, len(source))
+        self.source = source
+        self.items = _items(source, nodes)
+
+    def update(self, source: str) -> Tuple[int, int, int]:
+        """改为 source，返回 (lo, old_hi, new_hi)
+
+        表示原来的 items[lo:old_hi] 被替换为新的 items[lo:new_hi]，其余列表项
+        不变，之后的列表项只平移位置。
+        """
+        old_source = self.source
+        old_items = self.items
+        count = len(old_items)
+        prefix, suffix = common_affixes(old_source, source)
+        changed_end = len(old_source) - suffix
+        delta = len(source) - len(old_source)
+
+        # 向前后扩展到修改处与相邻列表项之间隔着逗号为止
+        lo = bisect_left(old_items, prefix, key=_item_end)
+        while lo and not _has_separator(
+                old_source, old_items[lo - 1].end,
+                min(prefix, old_items[lo].start) if lo < count else prefix):
+            lo -= 1
+        start = old_items[lo - 1].end if lo else 0
+        old_hi = lo
+        while old_hi < count and old_items[old_hi].start <= changed_end:
+            old_hi += 1
+
+        while True:
+            while old_hi < count and not _has_separator(
+                    old_source, max(changed_end, old_items[old_hi - 1].end if old_hi else 0),
+                    old_items[old_hi].start):
+                old_hi += 1
+            end = old_items[old_hi].start + delta if old_hi < count else len(source)
+            # 之前未闭合的括号可能被这次修改闭合，新增的括号可能在后面闭合，
+            # 这两种情况整体重新解析
+            if self._unclosed and self._unclosed[0] < end - delta:
+                return self._reset_range(source)
+            nodes, unclosed = _parse(source, start, end)
+            if old_hi == count:
+                break
+            if unclosed:
+                return self._reset_range(source)
+            # 修改处末尾的反斜杠可能转义了其后的逗号
+            if _ends_with_separator(source, nodes, changed_end + delta):
+                break
+            old_hi += 1
+
+        middle = _items(source, nodes)
+        if delta:
+            tail = [PromptItem(item.source, item.text, item.weight,
+                               item.start + delta, item.end + delta)
+                    for item in old_items[old_hi:]]
+        else:
+            tail = old_items[old_hi:]
+        self._unclosed = unclosed + [position + delta for position in self._unclosed]
+        self.source = source
+        self.items = old_items[:lo] + middle + tail
+        return lo, old_hi, lo + len(middle)
+
+    def _reset_range(self, source: str) -> Tuple[int, int, int]:
+        count = len(self.items)
+        self.reset(source)
+        return 0, count, len(self.items)
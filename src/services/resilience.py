@@ -0,0 +1,169 @@
+"""翻译请求的限流、重试和熔断
+
+TokenBucket 限制请求速率；临时性错误（连接失败、超时、429 和 5xx）按带随机
+抖动的指数退避重试；CircuitBreaker 在最近的请求失败率过高时暂停请求一段时间，
+期间直接失败，之后放行一次试探请求，成功则恢复。
+"""
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+import requests
+
+# 熔断器状态
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个请求，最多连续 capacity 个"""
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """取得一个令牌，令牌不足时等待，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class CircuitOpenError(Exception):
+    """熔断期间拒绝请求"""
+    pass
+
+
+class CircuitBreaker:
+    """按最近 window 次请求的失败率熔断
+
+    至少有 min_calls 次请求且失败率达到 threshold 时打开，cooldown 秒后
+    进入半开状态放行一次请求，成功后关闭，失败则重新打开。
+    """
+    def __init__(self, threshold: float = 0.5, window: int = 20,
+                 min_calls: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.opened = 0
+        self._results = deque(maxlen=window)
+        self._state = BREAKER_CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == BREAKER_OPEN and self._cooled_down():
+                return BREAKER_HALF_OPEN
+            return self._state
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.cooldown
+
+    def before_call(self):
+        """请求前调用，熔断期间抛出 CircuitOpenError"""
+        with self._lock:
+            if self._state == BREAKER_CLOSED:
+                return
+            if self._state == BREAKER_OPEN and self._cooled_down():
+                self._state = BREAKER_HALF_OPEN
+            if self._state == BREAKER_HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            raise CircuitOpenError("翻译服务暂时不可用，请稍后再试")
+
+    def record_success(self):
+        with self._lock:
+            self._trial_running = False
+            if self._state != BREAKER_CLOSED:
+                self._state = BREAKER_CLOSED
+                self._results.clear()
+            self._results.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            self._trial_running = False
+            if self._state == BREAKER_HALF_OPEN:
+                self._open()
+                return
+            self._results.append(False)
+            failures = self._results.count(False)
+            if (self._state == BREAKER_CLOSED and len(self._results) >= self.min_calls
+                    and failures / len(self._results) >= self.threshold):
+                self._open()
+
+    def _open(self):
+        self._state = BREAKER_OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+
+
+def is_transient(error: Exception) -> bool:
+    """是否为值得重试的临时性错误"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0,
+                  rng: random.Random = random) -> float:
+    """第 attempt 次重试前等待的秒数：在 [0, base * 2^attempt] 中随机取值"""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TranslationMetrics:
+    """翻译请求的延迟、失败、重试和限流等待统计"""
+    def __init__(self, samples: int = 1000):
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.rate_limited = 0.0
+        self._latencies = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.failures += 1
+            self._latencies.append(latency)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_wait(self, waited: float):
+        if waited:
+            with self._lock:
+                self.rate_limited += waited
+
+    def snapshot(self) -> Dict[str, float]:
+        """当前统计，延迟取最近的请求，单位为毫秒"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {'requests': self.requests, 'failures': self.failures,
+                     'retries': self.retries,
+                     'rate_limited_ms': self.rate_limited * 1000}
+        for name, q in (('p50_ms', 0.5), ('p95_ms', 0.95)):
+            stats[name] = (latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+                           if latencies else 0.0)
+        return stats
@@ -0,0 +1,94 @@
+"""序列差异
+
+使用 Myers 算法求两个序列之间的最短编辑脚本，结果为 difflib 风格的操作码
+(tag, i1, i2, j1, j2)，tag 为 'equal'、'delete'、'insert' 或 'replace'。
+比较前先去掉公共前缀和后缀，通常只需处理很短的中间部分；编辑数超过
+max_edits 时不再继续搜索，中间部分整体作为一次替换。
+"""
+from typing import List, Sequence, Tuple
+
+# 超过该编辑数时放弃求最短脚本
+DEFAULT_MAX_EDITS = 500
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+def _matches(a: Sequence, b: Sequence, max_edits: int):
+    """a、b 的最长公共子序列中各元素的下标对，编辑数超过 max_edits 时返回 None"""
+    n, m = len(a), len(b)
+    limit = min(n + m, max_edits)
+    offset = limit + 1
+    v = [0] * (2 * limit + 3)
+    # trace[d] 为第 d 轮开始前各对角线到达的最远位置
+    trace = []
+    for d in range(limit + 1):
+        trace.append(v[offset - d - 1:offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+
+def _backtrack(trace, x: int, y: int) -> List[Tuple[int, int]]:
+    pairs = []
+    for d in range(len(trace) - 1, -1, -1):
+        # trace[d] 保存对角线 -d-1 到 d+1
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1 + d + 1] < v[k + 1 + d + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k + d + 1]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            pairs.append((x, y))
+        x, y = prev_x, prev_y
+    pairs.reverse()
+    return pairs
+
+
+def diff_opcodes(a: Sequence, b: Sequence, max_edits: int = DEFAULT_MAX_EDITS) -> List[Opcode]:
+    """把 a 变为 b 的操作码，元素按 == 比较"""
+    n, m = len(a), len(b)
+    prefix = 0
+    while prefix < n and prefix < m and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < n - prefix and suffix < m - prefix and a[n - 1 - suffix] == b[m - 1 - suffix]:
+        suffix += 1
+
+    middle_a = a[prefix:n - suffix]
+    middle_b = b[prefix:m - suffix]
+    pairs = _matches(middle_a, middle_b, max_edits) if middle_a and middle_b else []
+    if pairs is None:
+        pairs = []
+    pairs = [(i + prefix, j + prefix) for i, j in pairs]
+    pairs = ([(i, i) for i in range(prefix)] + pairs
+             + [(n - suffix + i, m - suffix + i) for i in range(suffix)])
+
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for x, y in pairs + [(n, m)]:
+        if i < x or j < y:
+            tag = 'replace' if i < x and j < y else 'delete' if i < x else 'insert'
+            opcodes.append((tag, i, x, j, y))
+        if x < n:
+            if opcodes and opcodes[-1][0] == 'equal':
+                tag, i1, _, j1, _ = opcodes[-1]
+                opcodes[-1] = (tag, i1, x + 1, j1, y + 1)
+            else:
+                opcodes.append(('equal', x, x + 1, y, y + 1))
+        i, j = x + 1, y + 1
+    return opcodes
@@ -0,0 +1,75 @@
+"""提示词文字分类
+
+判断提示词是不含汉字（LATIN）、只有汉字（CJK）还是汉字与其他文字混合
+（MIXED），并取出混合文本中的中文片段，只把这些片段发送翻译。
+
+汉字包括基本区、扩展 A 至 G 区和兼容汉字。空白、数字、ASCII 标点以及中文
+标点和全角数字、符号不属于任何一类，因此“猫耳，长发”仍是纯中文，只有标点
+的文本不需要翻译。所有判断都由预编译的正则表达式在 C 中完成。
+"""
+import re
+from itertools import compress
+from typing import Iterable, List, Sequence, Tuple
+
+LATIN = 'latin'
+CJK = 'cjk'
+MIXED = 'mixed'
+
+# 汉字：基本区、扩展 A、兼容汉字、扩展 B 至 F、兼容汉字补充、扩展 G
+_IDEOGRAPHS = ('\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+               '\U00020000-\U0002ebef\U0002f800-\U0002fa1f\U00030000-\U0003134f')
+# 中文标点，全角标点、数字和符号（不含全角字母）
+_CJK_PUNCTUATION = '\u3000-\u303f\uff00-\uff20\uff3b-\uff40\uff5b-\uff65\uffe0-\uffee'
+# 不属于任何一类的字符
+_NEUTRAL = f'\\s\\d!-/:-@\\[-`{{-~{_CJK_PUNCTUATION}'
+
+_IDEOGRAPH = re.compile(f'[{_IDEOGRAPHS}]')
+_OTHER_CHAR = re.compile(f'[^{_IDEOGRAPHS}{_NEUTRAL}]')
+# 中文片段：以汉字开头和结尾，中间可以有中文标点和空白
+_CJK_SPAN = re.compile(f'[{_IDEOGRAPHS}](?:[{_IDEOGRAPHS}{_CJK_PUNCTUATION}\\s]*[{_IDEOGRAPHS}])?')
+
+
+def has_cjk(text: str) -> bool:
+    """是否含有汉字"""
+    return _IDEOGRAPH.search(text) is not None
+
+
+def classify(text: str) -> str:
+    """LATIN、CJK 或 MIXED，不含任何文字时为 LATIN"""
+    if _IDEOGRAPH.search(text) is None:
+        return LATIN
+    return MIXED if _OTHER_CHAR.search(text) is not None else CJK
+
+
+def classify_many(texts: Sequence[str]) -> List[str]:
+    """批量分类
+
+    在 C 中对全部文本依次查找汉字，不含汉字的文本直接为 LATIN，只有含汉字的
+    文本再逐个检查其他文字。
+    """
+    results = [LATIN] * len(texts)
+    for index in compress(range(len(texts)), map(_IDEOGRAPH.search, texts)):
+        results[index] = MIXED if _OTHER_CHAR.search(texts[index]) is not None else CJK
+    return results
+
+
+def cjk_spans(text: str) -> List[Tuple[int, int]]:
+    """文本中的中文片段 [(start, end)]"""
+    return [match.span() for match in _CJK_SPAN.finditer(text)]
+
+
+def splice_spans(text: str, spans: Sequence[Tuple[int, int]],
+                 replacements: Iterable[str]) -> str:
+    """把各片段替换为译文，译文与相邻的字母或数字之间补一个空格"""
+    parts = []
+    last = 0
+    for (start, end), replacement in zip(spans, replacements):
+        parts.append(text[last:start])
+        if replacement and start > 0 and text[start - 1].isalnum():
+            parts.append(' ')
+        parts.append(replacement)
+        if replacement and end < len(text) and text[end].isalnum():
+            parts.append(' ')
+        last = end
+    parts.append(text[last:])
+    return ''.join(parts)
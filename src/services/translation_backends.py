@@ -0,0 +1,101 @@
+"""翻译后端
+
+后端只负责把一段文本从一种语言翻译为另一种语言，缓存、分块和并发由
+TranslationService 处理。HTTP 后端通过共享的 requests.Session 复用
+keep-alive 连接，连接池大小可以配置。
+"""
+from typing import Dict, Optional
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+# 每个主机保持的连接数
+DEFAULT_POOL_SIZE = 8
+# 单次请求超时（秒）
+DEFAULT_TIMEOUT = 10
+
+
+class TranslationBackendError(Exception):
+    """后端返回了无法识别的结果"""
+    pass
+
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """创建带连接池的会话，可在多个线程中同时使用"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class TranslationBackend:
+    """翻译后端接口，translate 可能在多个线程中同时调用"""
+    # 单次请求的字符上限
+    char_limit = 5000
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        """翻译文本，语言代码使用 'en'、'zh-CN'"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class _HttpBackend(TranslationBackend):
+    def __init__(self, session: Optional[requests.Session] = None,
+                 pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT):
+        self._owns_session = session is None
+        self.session = session if session is not None else create_session(pool_size)
+        self.timeout = timeout
+
+    def close(self):
+        if self._owns_session:
+            self.session.close()
+
+
+class GoogleWebBackend(_HttpBackend):
+    """Google 翻译移动版网页"""
+    URL = 'https://translate.google.com/m'
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        response = self.session.get(self.URL, params={'sl': source, 'tl': target, 'q': text},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.text, 'html.parser')
+        element = soup.find('div', {'class': 'result-container'})
+        if element is None:
+            element = soup.find('div', {'class': 't0'})
+        if element is None:
+            raise TranslationBackendError("无法解析翻译结果")
+        return element.get_text()
+
+
+class LibreTranslateBackend(_HttpBackend):
+    """LibreTranslate 风格的 JSON 接口，也可指向本地的替身服务"""
+    # 与 Google 不同的语言代码
+    LANGUAGE_CODES: Dict[str, str] = {'zh-CN': 'zh'}
+
+    def __init__(self, url: str, api_key: Optional[str] = None,
+                 session: Optional[requests.Session] = None,
+                 pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT,
+                 char_limit: Optional[int] = None):
+        super().__init__(session, pool_size, timeout)
+        self.url = url.rstrip('/') + '/translate'
+        self.api_key = api_key
+        if char_limit is not None:
+            self.char_limit = char_limit
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        payload = {'q': text,
+                   'source': self.LANGUAGE_CODES.get(source, source),
+                   'target': self.LANGUAGE_CODES.get(target, target),
+                   'format': 'text'}
+        if self.api_key:
+            payload['api_key'] = self.api_key
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        try:
+            return response.json()['translatedText']
+        except (ValueError, KeyError, TypeError) as e:
+            raise TranslationBackendError(f"无法解析翻译结果: {e}")
@@ -0,0 +1,168 @@
+"""翻译结果的本地缓存
+
+以 (规范化文本, 翻译方向) 为键保存在 SQLite 文件中，程序重启后仍然有效。
+条目数超过上限时按最近使用时间淘汰最久未用的条目；设置 ttl 后，
+超过有效期的条目视为未命中并在读取时删除。
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 默认缓存文件位置
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.sd_prompt_manager',
+                                  'translation_cache.db')
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+def normalize_text(text: str) -> str:
+    """缓存键使用的文本：合并空白并忽略大小写"""
+    return ' '.join(text.split()).casefold()
+
+
+def direction_key(to_english: bool) -> str:
+    return 'zh-en' if to_english else 'en-zh'
+
+
+class TranslationCache:
+    """基于 SQLite 的持久化翻译缓存，可在多个线程中使用"""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS translations (
+            text TEXT NOT NULL,
+            direction TEXT NOT NULL,
+            translation TEXT NOT NULL,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL,
+            PRIMARY KEY (text, direction)
+        );
+        CREATE INDEX IF NOT EXISTS idx_translations_accessed
+            ON translations (accessed);
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        # 条目有效期（秒），None 表示永不过期
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._size = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get(self, text: str, to_english: bool) -> Optional[str]:
+        """查找单个文本的翻译，未命中时返回 None"""
+        return self.get_many([text], to_english).get(text)
+
+    def get_many(self, texts: Iterable[str], to_english: bool) -> Dict[str, str]:
+        """批量查找，返回命中的 {原文: 译文}"""
+        texts = list(texts)
+        direction = direction_key(to_english)
+        keys: Dict[str, List[str]] = {}
+        for text in texts:
+            keys.setdefault(normalize_text(text), []).append(text)
+
+        now = time.time()
+        found: Dict[str, str] = {}
+        hit_keys: List[str] = []
+        expired: List[str] = []
+        with self._lock:
+            normalized = list(keys)
+            # SQLite 对单条语句的参数数量有限制，分批查询
+            for i in range(0, len(normalized), 500):
+                batch = normalized[i:i + 500]
+                rows = self._conn.execute(
+                    "SELECT text, translation, created FROM translations "
+                    f"WHERE direction = ? AND text IN ({','.join('?' * len(batch))})",
+                    [direction, *batch])
+                for key, translation, created in rows:
+                    if self.ttl is not None and now - created > self.ttl:
+                        expired.append(key)
+                        continue
+                    hit_keys.append(key)
+                    for text in keys[key]:
+                        found[text] = translation
+            if hit_keys or expired:
+                with self._transaction():
+                    self._conn.executemany(
+                        "UPDATE translations SET accessed = ? "
+                        "WHERE text = ? AND direction = ?",
+                        ((now, key, direction) for key in hit_keys))
+                    removed = self._conn.executemany(
+                        "DELETE FROM translations WHERE text = ? AND direction = ?",
+                        ((key, direction) for key in expired)).rowcount
+                self._size -= removed
+            hits = sum(1 for text in texts if text in found)
+            self.hits += hits
+            self.misses += len(texts) - hits
+        return found
+
+    def put(self, text: str, translation: str, to_english: bool):
+        self.put_many([(text, translation)], to_english)
+
+    def put_many(self, pairs: Iterable[Tuple[str, str]], to_english: bool):
+        """保存 (原文, 译文)，超过上限时淘汰最久未使用的条目"""
+        direction = direction_key(to_english)
+        now = time.time()
+        rows = {normalize_text(text): translation for text, translation in pairs
+                if text.strip() and translation}
+        if not rows:
+            return
+        with self._lock:
+            with self._transaction():
+                # 先更新已有条目再插入其余条目，插入的行数即新增的条目数，
+                # 不必每次重新统计整张表
+                self._conn.executemany(
+                    "UPDATE translations SET translation = ?, created = ?, accessed = ? "
+                    "WHERE text = ? AND direction = ?",
+                    ((translation, now, now, key, direction)
+                     for key, translation in rows.items()))
+                inserted = self._conn.executemany(
+                    "INSERT OR IGNORE INTO translations "
+                    "(text, direction, translation, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    ((key, direction, translation, now, now)
+                     for key, translation in rows.items())).rowcount
+                self._size += inserted
+                if self._size > self.max_entries:
+                    self._size -= self._conn.execute(
+                        "DELETE FROM translations WHERE rowid IN ("
+                        "SELECT rowid FROM translations ORDER BY accessed LIMIT ?)",
+                        (self._size - self.max_entries,)).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM translations")
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """命中、未命中次数和当前条目数"""
+        return {'hits': self.hits, 'misses': self.misses, 'entries': self._size}
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
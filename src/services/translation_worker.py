@@ -0,0 +1,106 @@
+"""后台翻译
+
+翻译在 QThreadPool 的线程中进行，每收到一部分结果就通过信号发回界面线程。
+每次开始翻译都会生成新的批次号，旧批次随之取消，它之后发出的结果会被忽略。
+"""
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from .translator import TranslationService, TranslationError, get_translation_service
+
+
+class _TaskSignals(QObject):
+    """QRunnable 不能发出信号，由该对象代为发出，参数中带有批次号"""
+    translated = pyqtSignal(int, list)
+    failed = pyqtSignal(int, str)
+    finished = pyqtSignal(int)
+
+
+class _TranslationTask(QRunnable):
+    def __init__(self, service: TranslationService,
+                 prompts: List[Tuple[Hashable, str]], to_english: bool,
+                 generation: int):
+        super().__init__()
+        self.service = service
+        self.prompts = prompts
+        self.to_english = to_english
+        self.generation = generation
+        self.signals = _TaskSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self):
+        # 原文 -> 使用该原文的键，相同的原文只翻译一次
+        keys: Dict[str, List[Hashable]] = {}
+        for key, text in self.prompts:
+            keys.setdefault(text, []).append(key)
+        results = self.service.iter_batch_translate(list(keys), self.to_english)
+        try:
+            for partial in results:
+                if self._cancelled.is_set():
+                    break
+                self.signals.translated.emit(self.generation, [
+                    (key, translation)
+                    for text, translation in partial.items()
+                    for key in keys.get(text, ())])
+        except TranslationError as e:
+            self.signals.failed.emit(self.generation, str(e))
+        except Exception as e:
+            self.signals.failed.emit(self.generation, f"翻译失败: {str(e)}")
+        finally:
+            # 关闭生成器，取消尚未发送的请求
+            results.close()
+            self.signals.finished.emit(self.generation)
+
+
+class BackgroundTranslator(QObject):
+    """在后台翻译 (键, 原文) 列表，结果以 [(键, 译文)] 分批发出
+
+    同一时间只有一个批次有效，start 会取代正在进行的批次。
+    """
+    translated = pyqtSignal(list)
+    failed = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, service: Optional[TranslationService] = None, parent=None):
+        super().__init__(parent)
+        # 未指定时每个批次都使用当时的共用翻译服务
+        self.service = service
+        self._generation = 0
+        self._task = None
+
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    def start(self, prompts: List[Tuple[Hashable, str]], to_english: bool = False):
+        self.cancel()
+        self._generation += 1
+        service = self.service if self.service is not None else get_translation_service()
+        task = _TranslationTask(service, prompts, to_english, self._generation)
+        task.signals.translated.connect(self._on_translated)
+        task.signals.failed.connect(self._on_failed)
+        task.signals.finished.connect(self._on_finished)
+        self._task = task
+        QThreadPool.globalInstance().start(task)
+
+    def cancel(self):
+        """取消当前批次，之后收到的结果都会被忽略"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._generation += 1
+
+    def _on_translated(self, generation: int, results: list):
+        if generation == self._generation:
+            self.translated.emit(results)
+
+    def _on_failed(self, generation: int, message: str):
+        if generation == self._generation:
+            self.failed.emit(message)
+
+    def _on_finished(self, generation: int):
+        if generation == self._generation:
+            self._task = None
+            self.finished.emit()
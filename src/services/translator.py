@@ -1,31 +1,347 @@
-from deep_translator import GoogleTranslator
-from typing import List, Tuple, Optional
+import re
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
+from ..data.prompt_library import PROMPT_LIBRARY, PromptLibrary
+from .resilience import (BREAKER_OPEN, CircuitBreaker, CircuitOpenError, TokenBucket,
+                         TranslationMetrics, backoff_delay, is_transient)
+from .translation_backends import DEFAULT_POOL_SIZE, GoogleWebBackend, TranslationBackend
+from .translation_cache import TranslationCache, normalize_text
+
+# 单次请求的字符上限，Google 网页接口限制为 5000
+DEFAULT_CHAR_BUDGET = 4500
+# 同时发送的请求数
+DEFAULT_MAX_WORKERS = 4
+# 每秒请求数上限
+DEFAULT_RATE_LIMIT = 5.0
+# 临时性错误的最大重试次数
+DEFAULT_MAX_RETRIES = 3
+# 文本之间的分隔符，文本内部的换行在发送前替换为空格，因此不会混淆
+SEPARATOR = "\n"
+# 一个请求中有多个文本时，每个文本前加上序号标记，据此从译文中取回各文本
+MARKER = "[[{}]] "
+# 译文中的序号标记，翻译后方括号之间可能多出空格
+_MARKER_PATTERN = re.compile(r'\[\s*\[\s*(\d+)\s*\]\s*\]')
+
+_shared_cache: Optional[TranslationCache] = None
+_shared_cache_failed = False
+_shared_service: Optional['TranslationService'] = None
+_shared_service_lock = threading.Lock()
+
+
+def get_translation_cache() -> Optional[TranslationCache]:
+    """所有翻译服务共用的缓存，打开失败时返回 None"""
+    global _shared_cache, _shared_cache_failed
+    if _shared_cache is None and not _shared_cache_failed:
+        try:
+            _shared_cache = TranslationCache()
+        except Exception as e:
+            _shared_cache_failed = True
+            print(f"打开翻译缓存失败: {e}")
+    return _shared_cache
+
+
+def pack_chunks(texts: List[str], budget: int = DEFAULT_CHAR_BUDGET) -> List[List[str]]:
+    """按字符预算把文本依次装入多个请求，超过预算的单个文本独占一个请求"""
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for text in texts:
+        extra = len(text) + len(MARKER.format(len(current)))
+        if current:
+            extra += len(SEPARATOR)
+            if size + extra > budget:
+                chunks.append(current)
+                current, size, extra = [], 0, len(text) + len(MARKER.format(0))
+        current.append(text)
+        size += extra
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_marked(result: str, count: int) -> Optional[List[str]]:
+    """按序号标记拆分译文，标记 0 到 count-1 必须依次各出现一次，否则返回 None"""
+    matches = list(_MARKER_PATTERN.finditer(result))
+    if [int(match.group(1)) for match in matches] != list(range(count)):
+        return None
+    ends = [match.start() for match in matches[1:]] + [len(result)]
+    return [' '.join(result[match.end():end].split())
+            for match, end in zip(matches, ends)]
+
+
+def get_translation_service() -> 'TranslationService':
+    """进程内共用的翻译服务，第一次调用时创建"""
+    global _shared_service
+    with _shared_service_lock:
+        if _shared_service is None:
+            _shared_service = TranslationService()
+        return _shared_service
+
+
+def set_translation_service(service: 'TranslationService'):
+    """替换共用的翻译服务，例如指向本地的替身后端或调整连接池大小
+
+    使用方在每次翻译时才调用 get_translation_service()，之后的翻译会使用新
+    服务；旧服务可能仍有正在进行的翻译，因此不在这里关闭，由最后一个引用
+    释放时回收。
+    """
+    global _shared_service
+    with _shared_service_lock:
+        _shared_service = service
+
 
 class TranslationService:
-    def __init__(self):
-        self.en_to_zh = GoogleTranslator(source='en', target='zh-CN')
-        self.zh_to_en = GoogleTranslator(source='zh-CN', target='en')
+    def __init__(self, cache: Optional[TranslationCache] = None,
+                 library: Optional[PromptLibrary] = None,
+                 backend: Optional[TranslationBackend] = None,
+                 char_budget: Optional[int] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 rate_limit: float = DEFAULT_RATE_LIMIT,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 breaker: Optional[CircuitBreaker] = None):
+        # 默认使用 Google 网页翻译，连接池在所有线程之间共享
+        self.backend = backend if backend is not None else GoogleWebBackend(pool_size=pool_size)
+        if char_budget is None:
+            char_budget = min(DEFAULT_CHAR_BUDGET, self.backend.char_limit)
+        self.char_budget = char_budget
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.rate_limiter = TokenBucket(rate_limit, max(rate_limit, max_workers))
+        self.max_retries = max_retries
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.request_metrics = TranslationMetrics()
+        # (规范化文本, 是否译为英文) -> 正在进行的翻译，相同的请求共用一个结果
+        self._in_flight: Dict[Tuple[str, bool], Future] = {}
+        self._in_flight_lock = threading.Lock()
+        self.cache = cache if cache is not None else get_translation_cache()
+        # 提示词库中已有的对照优先于缓存和网络
+        self.library = library if library is not None else PROMPT_LIBRARY
+        self.dictionary_hits = 0
     
     def translate_text(self, text: str, to_english: bool = False) -> str:
-        """翻译单个文本"""
+        """翻译单个文本，依次查找提示词库、缓存，最后请求网络"""
+        known = self.library.lookup_translations([text], to_english)
+        if text in known:
+            self.dictionary_hits += 1
+            return known[text]
+        if self.cache is not None:
+            cached = self.cache.get(text, to_english)
+            if cached is not None:
+                return cached
+        key = normalize_text(text)
+        while True:
+            owned, shared = self._claim([key], to_english)
+            if owned:
+                break
+            try:
+                # 相同的文本正在由其他调用翻译，等待其结果
+                return shared[key].result()
+            except CancelledError:
+                continue
         try:
-            translator = self.zh_to_en if to_english else self.en_to_zh
-            return translator.translate(text)
+            result = self._translate_raw(text, to_english)
+        except CircuitOpenError as e:
+            error = TranslationUnavailable(str(e))
         except Exception as e:
-            raise TranslationError(f"翻译失败: {str(e)}")
+            error = TranslationError(f"翻译失败: {str(e)}")
+        else:
+            if self.cache is not None and result:
+                self.cache.put(text, result, to_english)
+            self._release(owned, to_english, results={key: result})
+            return result
+        self._release(owned, to_english, error=error)
+        raise error
     
     def batch_translate(self, texts: List[str], to_english: bool = False) -> List[str]:
-        """批量翻译文本"""
+        """批量翻译文本，只有提示词库和缓存中都没有的文本才会发送
+
+        熔断期间不再请求网络，只返回提示词库和缓存中的结果，其余为空字符串。
+        """
+        found: Dict[str, str] = {}
+        try:
+            for partial in self.iter_batch_translate(texts, to_english):
+                found.update(partial)
+        except TranslationUnavailable:
+            pass
+        return [found.get(text, '') for text in texts]
+
+    def iter_batch_translate(self, texts: List[str],
+                             to_english: bool = False) -> Iterator[Dict[str, str]]:
+        """逐步产出翻译结果 {原文: 译文}
+
+        先一次产出提示词库和缓存中已有的结果，再按请求完成的先后产出网络翻译的结果。
+        提前关闭生成器时取消尚未开始的请求。熔断期间产出已有结果后抛出
+        TranslationUnavailable。
+        """
         if not texts:
-            return []
-            
+            return
+
+        found = self.library.lookup_translations(texts, to_english)
+        self.dictionary_hits += sum(1 for text in texts if text in found)
+        if self.cache is not None:
+            unknown = [text for text in texts if text not in found]
+            if unknown:
+                found.update(self.cache.get_many(unknown, to_english))
+        if found:
+            yield found
+        # 未命中的文本按规范化文本去重，每组只发送第一个，结果分发给组内所有文本
+        groups: Dict[str, List[str]] = {}
+        for text in texts:
+            if text not in found:
+                groups.setdefault(normalize_text(text), []).append(text)
+
+        while groups:
+            if self.breaker.state == BREAKER_OPEN:
+                raise TranslationUnavailable("翻译服务暂时不可用，请稍后再试")
+            owned, shared = self._claim(groups, to_english)
+            chunks = pack_chunks([groups[key][0] for key in owned], self.char_budget)
+            if len(chunks) == 1:
+                yield self._fan_out(groups, self._translate_owned(chunks[0], owned, to_english))
+                chunks = []
+            if chunks and self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers,
+                                                    thread_name_prefix='translate')
+            chunk_tasks = {self._executor.submit(self._translate_owned, chunk, owned, to_english):
+                           chunk for chunk in chunks}
+            shared_tasks = {future: key for key, future in shared.items()}
+            retry: Dict[str, List[str]] = {}
+            try:
+                for future in as_completed([*chunk_tasks, *shared_tasks]):
+                    if future in chunk_tasks:
+                        yield self._fan_out(groups, future.result())
+                    elif future.cancelled():
+                        # 翻译该文本的调用已取消，重新登记
+                        key = shared_tasks[future]
+                        retry[key] = groups[key]
+                    else:
+                        translation = future.result()
+                        yield {text: translation for text in groups[shared_tasks[future]]}
+            finally:
+                for future, chunk in chunk_tasks.items():
+                    if future.cancel():
+                        # 尚未开始的请求取消后通知等待同一文本的调用
+                        self._release({key: owned[key] for key in map(normalize_text, chunk)},
+                                      to_english)
+            groups = retry
+
+    def _claim(self, keys: Iterable[str], to_english: bool
+               ) -> Tuple[Dict[str, Future], Dict[str, Future]]:
+        """登记要请求网络的文本
+
+        返回 (由本次调用翻译的, 正在由其他调用翻译的) {规范化文本: Future}。
+        """
+        owned: Dict[str, Future] = {}
+        shared: Dict[str, Future] = {}
+        with self._in_flight_lock:
+            for key in keys:
+                future = self._in_flight.get((key, to_english))
+                if future is None:
+                    future = self._in_flight[(key, to_english)] = Future()
+                    owned[key] = future
+                else:
+                    shared[key] = future
+        return owned, shared
+
+    def _release(self, owned: Dict[str, Future], to_english: bool,
+                 results: Optional[Dict[str, str]] = None,
+                 error: Optional[BaseException] = None):
+        """结束登记的翻译，把结果或错误交给等待的调用，两者都没有时视为取消"""
+        with self._in_flight_lock:
+            for key, future in owned.items():
+                if self._in_flight.get((key, to_english)) is future:
+                    del self._in_flight[(key, to_english)]
+        for key, future in owned.items():
+            if error is not None:
+                future.set_exception(error)
+            elif results is not None:
+                future.set_result(results[key])
+            else:
+                # 只有 set_running_or_notify_cancel 会唤醒 as_completed 中的等待
+                future.cancel()
+                future.set_running_or_notify_cancel()
+
+    def _translate_owned(self, texts: List[str], owned: Dict[str, Future],
+                         to_english: bool) -> Dict[str, str]:
+        """翻译一个请求中由本次调用登记的文本"""
+        futures = {key: owned[key] for key in map(normalize_text, texts)}
+        try:
+            pairs = self._finish_chunk(texts, to_english)
+        except BaseException as e:
+            self._release(futures, to_english, error=e)
+            raise
+        self._release(futures, to_english,
+                      results={normalize_text(text): translation
+                               for text, translation in pairs.items()})
+        return pairs
+
+    @staticmethod
+    def _fan_out(groups: Dict[str, List[str]], pairs: Dict[str, str]) -> Dict[str, str]:
+        """把每组代表文本的译文分发给组内所有文本"""
+        return {text: translation for sent, translation in pairs.items()
+                for text in groups[normalize_text(sent)]}
+
+    def _finish_chunk(self, texts: List[str], to_english: bool) -> Dict[str, str]:
+        """翻译一个请求并写入缓存"""
         try:
-            translator = self.zh_to_en if to_english else self.en_to_zh
-            combined = "\n".join(texts)
-            results = translator.translate(combined)
-            return [r.strip() for r in results.split("\n")]
+            translations = self._translate_chunk(texts, to_english)
+        except CircuitOpenError as e:
+            raise TranslationUnavailable(str(e))
         except Exception as e:
             raise TranslationError(f"批量翻译失败: {str(e)}")
+        pairs = dict(zip(texts, translations))
+        if self.cache is not None:
+            self.cache.put_many(pairs.items(), to_english)
+        return pairs
+
+    def _translate_chunk(self, texts: List[str], to_english: bool) -> List[str]:
+        """翻译一个请求，译文中的序号标记缺失或顺序不对时对半拆分重试"""
+        if len(texts) == 1:
+            # 单个文本不加标记，被拆成多行时合并为一行
+            result = self._translate_raw(' '.join(texts[0].split()), to_english) or ''
+            return [' '.join(result.split())]
+        combined = SEPARATOR.join(MARKER.format(index) + ' '.join(text.split())
+                                  for index, text in enumerate(texts))
+        result = self._translate_raw(combined, to_english) or ''
+        translations = split_marked(result, len(texts))
+        if translations is not None:
+            return translations
+        mid = len(texts) // 2
+        return (self._translate_chunk(texts[:mid], to_english)
+                + self._translate_chunk(texts[mid:], to_english))
+
+    def _translate_raw(self, text: str, to_english: bool) -> str:
+        """经过熔断、限流后调用后端，临时性错误按指数退避重试"""
+        source, target = ('zh-CN', 'en') if to_english else ('en', 'zh-CN')
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            self.request_metrics.record_wait(self.rate_limiter.acquire())
+            start = time.perf_counter()
+            try:
+                result = self.backend.translate(text, source, target)
+            except Exception as e:
+                self.request_metrics.record(time.perf_counter() - start, ok=False)
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or not is_transient(e):
+                    raise
+                self.request_metrics.record_retry()
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            self.request_metrics.record(time.perf_counter() - start, ok=True)
+            self.breaker.record_success()
+            return result
+
+    def cache_stats(self) -> Dict[str, int]:
+        """提示词库命中次数，以及缓存命中、未命中次数和条目数"""
+        stats = {'hits': 0, 'misses': 0, 'entries': 0}
+        if self.cache is not None:
+            stats = self.cache.stats()
+        stats['dictionary_hits'] = self.dictionary_hits
+        return stats
     
     def translate_prompts(self, prompts: List[Tuple[int, str]], 
                         to_english: bool = False) -> List[Tuple[int, str, str]]:
@@ -53,6 +369,27 @@ class TranslationService:
             raise TranslationError(f"提示词翻译失败: {str(e)}")
 
 
+    def metrics(self) -> Dict[str, object]:
+        """请求延迟、失败、重试、限流等待和熔断状态，以及缓存统计"""
+        stats = self.request_metrics.snapshot()
+        stats['breaker_state'] = self.breaker.state
+        stats['breaker_opened'] = self.breaker.opened
+        stats.update(self.cache_stats())
+        return stats
+
+    def close(self):
+        """关闭线程池和后端连接"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.backend.close()
+
+
 class TranslationError(Exception):
     """翻译错误异常类"""
-    pass 
\ No newline at end of file
+    pass 
+
+
+class TranslationUnavailable(TranslationError):
+    """熔断期间拒绝请求"""
+    pass
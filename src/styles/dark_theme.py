@@ -120,4 +120,19 @@ QPushButton {
 QPushButton:hover {
     background-color: #1565c0;
 }
-""" 
\ No newline at end of file
+""" 
+COMPLETER_POPUP = """
+QListView {
+    border: 1px solid #404040;
+    background-color: #2d2d2d;
+    color: #e0e0e0;
+    outline: none;
+}
+QListView::item {
+    padding: 4px 8px;
+}
+QListView::item:selected {
+    background-color: #264f78;
+    color: white;
+}
+"""
@@ -144,4 +144,33 @@ QPushButton:hover {
 QPushButton:pressed {
     background-color: #1565c0;
 }
-""" 
\ No newline at end of file
+""" 
+# 保存状态提示样式
+SAVE_STATUS_STYLE = """
+QLabel {
+    color: #999999;
+    font-size: 12px;
+}
+"""
+
+SAVE_ERROR_STYLE = """
+QLabel {
+    color: #f44336;
+    font-size: 12px;
+}
+"""
+
+# 搜索框样式
+SEARCH_EDIT_STYLE = """
+QLineEdit {
+    background-color: #2d2d2d;
+    border: 1px solid #404040;
+    border-radius: 4px;
+    padding: 4px 8px;
+    color: #e0e0e0;
+    min-width: 180px;
+}
+QLineEdit:focus {
+    border: 1px solid #1976d2;
+}
+"""
@@ -1,14 +1,24 @@
 from PyQt6.QtWidgets import (QTreeWidget, QHeaderView, QMenu, QDialog, QMessageBox, 
-                          QApplication, QPushButton, QHBoxLayout, QWidget)
-from PyQt6.QtCore import Qt
+                          QPushButton, QHBoxLayout, QWidget)
+from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QIcon
 from ..dialogs.prompt_translation_dialog import PromptTranslationDialog
-from deep_translator import GoogleTranslator
 import time
 from ..styles.dark_theme import TREE_WIDGET
-from ..services.translator import TranslationService, TranslationError
+from ..services.translation_worker import BackgroundTranslator
+from ..services.text_classifier import MIXED, classify_many, cjk_spans, splice_spans
+
+# 等待翻译的行在第 1 列保存一个编号，译文按编号找到对应的行
+PENDING_ROLE = Qt.ItemDataRole.UserRole + 1
+PENDING_TEXT = "翻译中…"
+# 由输入框解析得到的行在第 0 列保存 (原文, 文本, 权重)，未修改时按原文写回
+SOURCE_ROLE = Qt.ItemDataRole.UserRole + 2
 
 class DraggableTreeWidget(QTreeWidget):
+    # 后台翻译开始、结束（参数为是否翻译为英文）
+    translationStarted = pyqtSignal()
+    translationFinished = pyqtSignal(bool)
+
     def __init__(self):
         super().__init__()
         self.dragged_item = None
@@ -42,8 +52,15 @@ class DraggableTreeWidget(QTreeWidget):
         self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.customContextMenuRequested.connect(self.show_context_menu)
         
-        # 使用翻译服务
-        self.translation_service = TranslationService()
+        # 使用共用的翻译服务，每个批次开始时才取得，以便替换服务后立即生效
+        self.background_translator = BackgroundTranslator(parent=self)
+        self.background_translator.translated.connect(self._apply_translations)
+        self.background_translator.failed.connect(self._on_translation_failed)
+        self.background_translator.finished.connect(self._on_translation_finished)
+        self._pending_id = 0
+        self._translating_to_english = False
+        # 中英混合的行只翻译其中的中文片段：编号 -> (原文, 片段位置, {片段序号: 译文})
+        self._mixed = {}
     
     def _find_prompt_editor(self):
         """查找 PromptEditor 父窗口"""
@@ -92,12 +109,6 @@ class DraggableTreeWidget(QTreeWidget):
         # 保持选中状态
         self.setCurrentItem(taken_item)
         
-        # 重新创建所有项的操作列
-        for i in range(self.topLevelItemCount()):
-            item = self.topLevelItem(i)
-            action_widget = self._create_action_widget(item)
-            self.setItemWidget(item, 3, action_widget)
-        
         # 更新输入框
         prompt_editor = self._find_prompt_editor()
         if prompt_editor:
@@ -145,42 +156,111 @@ class DraggableTreeWidget(QTreeWidget):
             self.translate_all_prompts()
     
     def translate_prompt(self, item):
-        """翻译单个提示词"""
-        try:
-            text = item.text(0)
-            translation = self.translation_service.translate_text(text)
-            item.setText(1, translation)
-        except TranslationError as e:
-            QMessageBox.warning(self, "翻译错误", str(e))
+        """在后台翻译单个提示词，与批量翻译相同，错误通过 _on_translation_failed 提示"""
+        self.translate_items([item])
     
     def translate_all_prompts(self):
-        """批量翻译所有提示词"""
-        # 收集需要翻译的提示词
-        to_translate = []
+        """在后台批量翻译所有没有翻译的提示词"""
+        self.cancel_translation()
         items = []
-        
         for i in range(self.topLevelItemCount()):
             item = self.topLevelItem(i)
             if not item.text(1):  # 如果没有翻译
-                to_translate.append((i, item.text(0)))
                 items.append(item)
-        
-        if not to_translate:
+        self.translate_items(items)
+
+    def translate_items(self, items, to_english=False):
+        """在后台翻译这些行的第 0 列，取代正在进行的翻译
+
+        译文到达前第 1 列显示等待标记。翻译为英文时原文移到第 1 列，
+        译文写入第 0 列；中英混合的文本只翻译其中的中文片段。
+        """
+        self.cancel_translation()
+        texts = [item.text(0) for item in items]
+        kinds = classify_many(texts) if to_english else [None] * len(texts)
+        prompts = []
+        for item, text, kind in zip(items, texts, kinds):
+            self._pending_id += 1
+            item.setData(1, PENDING_ROLE, self._pending_id)
+            item.setText(1, PENDING_TEXT)
+            if kind == MIXED:
+                spans = cjk_spans(text)
+                self._mixed[self._pending_id] = (text, spans, {})
+                prompts.extend(((self._pending_id, index), text[start:end])
+                               for index, (start, end) in enumerate(spans))
+            else:
+                prompts.append((self._pending_id, text))
+        if not prompts:
             return
-        
-        try:
-            # 使用翻译服务进行批量翻译
-            results = self.translation_service.translate_prompts(to_translate)
-            
-            # 更新界面
-            for item, (_, _, translation) in zip(items, results):
+        self._translating_to_english = to_english
+        self.background_translator.start(prompts, to_english)
+        self.translationStarted.emit()
+
+    def is_translating(self):
+        return self.background_translator.is_running()
+
+    def cancel_translation(self):
+        """取消后台翻译，尚未翻译的行恢复为没有翻译"""
+        if self.background_translator.is_running():
+            self.background_translator.cancel()
+            self._clear_pending()
+            self.translationFinished.emit(self._translating_to_english)
+
+    def _pending_items(self):
+        """等待翻译的行，编号 -> 行"""
+        items = {}
+        for i in range(self.topLevelItemCount()):
+            item = self.topLevelItem(i)
+            pending_id = item.data(1, PENDING_ROLE)
+            if pending_id is not None:
+                items[pending_id] = item
+        return items
+
+    def _clear_pending(self):
+        self._mixed.clear()
+        for item in self._pending_items().values():
+            item.setData(1, PENDING_ROLE, None)
+            item.setText(1, "")
+
+    def _apply_translations(self, results):
+        """填入一批译文，已删除的行直接跳过"""
+        items = self._pending_items()
+        for key, translation in results:
+            if isinstance(key, tuple):
+                # 混合文本的一个中文片段，全部片段翻译完成后拼回原文
+                pending_id, index = key
+                if pending_id not in self._mixed:
+                    continue
+                text, spans, parts = self._mixed[pending_id]
+                parts[index] = translation
+                if len(parts) < len(spans):
+                    continue
+                del self._mixed[pending_id]
+                if all(parts.values()):
+                    translation = splice_spans(text, spans, [parts[i] for i in range(len(spans))])
+                else:
+                    translation = ""
+            else:
+                pending_id = key
+            item = items.get(pending_id)
+            if item is None:
+                continue
+            item.setData(1, PENDING_ROLE, None)
+            if not self._translating_to_english:
                 item.setText(1, translation)
-                
-        except TranslationError as e:
-            QMessageBox.warning(self, "翻译错误", str(e))
-        
-        # 让界面及时刷新
-        QApplication.processEvents() 
+            elif translation:
+                item.setText(1, item.text(0))
+                item.setText(0, translation)
+            else:
+                item.setText(1, "")
+
+    def _on_translation_failed(self, message):
+        QMessageBox.warning(self, "翻译错误", message)
+
+    def _on_translation_finished(self):
+        # 翻译失败时未完成的行恢复为没有翻译
+        self._clear_pending()
+        self.translationFinished.emit(self._translating_to_english)
     
     def _create_action_widget(self, item):
         """创建操作按钮组"""
@@ -276,4 +356,10 @@ class DraggableTreeWidget(QTreeWidget):
         """重写添加项方法，添加操作按钮"""
         super().addTopLevelItem(item)
         action_widget = self._create_action_widget(item)
-        self.setItemWidget(item, 3, action_widget) 
\ No newline at end of file
+        self.setItemWidget(item, 3, action_widget) 
+    
+    def insertTopLevelItem(self, index, item):
+        """重写插入项方法，添加操作按钮"""
+        super().insertTopLevelItem(index, item)
+        action_widget = self._create_action_widget(item)
+        self.setItemWidget(item, 3, action_widget)
@@ -1,11 +1,39 @@
+import re
+from bisect import bisect_left
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, 
-                            QPushButton, QTreeWidgetItem, QMessageBox, QStyle, QLabel,
+                            QPushButton, QTreeWidgetItem, QStyle, QLabel,
                             QDialog)
 from PyQt6.QtGui import QTextCursor, QTextCharFormat, QColor, QPalette
-from PyQt6.QtCore import Qt
-from .draggable_tree import DraggableTreeWidget
+from PyQt6.QtCore import Qt, QTimer
+from .draggable_tree import DraggableTreeWidget, SOURCE_ROLE
+from .prompt_input import PromptInputEdit
 from ..styles.dark_theme import *  # 导入样式
-from ..services.translator import TranslationService, TranslationError
+from ..services.pretranslator import Pretranslator
+from ..services.prompt_parser import (IncrementalParser, common_affixes, parse_prompt,
+                                      prompt_items, format_item)
+from ..services.sequence_diff import diff_opcodes
+from ..services.text_classifier import CJK, LATIN, MIXED, classify_many, cjk_spans
+
+# 停止输入多久后开始预翻译（毫秒）
+PRETRANSLATE_DELAY = 600
+
+ASTRAL_CHAR = re.compile('[\U00010000-\U0010ffff]')
+
+
+def astral_positions(text):
+    """text 中 BMP 以外字符的位置，这些字符在 QTextDocument 中占两个位置"""
+    return [match.start() for match in ASTRAL_CHAR.finditer(text)]
+
+
+def row_source(item):
+    """列表项对应的提示词原文，文本和权重未修改时保留原有语法"""
+    text = item.text(0)
+    weight = item.text(2)
+    source = item.data(0, SOURCE_ROLE)
+    if source and source[1] == text and source[2] == weight:
+        return source[0]
+    return format_item(text, weight)
+
 
 class PromptEditor(QWidget):
     def __init__(self):
@@ -57,7 +85,7 @@ class PromptEditor(QWidget):
         left_layout = QVBoxLayout()
         left_layout.setSpacing(10)
         
-        self.input_field = QTextEdit()
+        self.input_field = PromptInputEdit()
         self.input_field.setPlaceholderText("输入提示词，用逗号分隔")
         self.input_field.setMinimumWidth(300)
         self.input_field.setStyleSheet(TEXT_EDIT)
@@ -85,10 +113,26 @@ class PromptEditor(QWidget):
         # 连接信号
         self.add_button.clicked.connect(self.generate_prompt_list)
         self.translate_button.clicked.connect(self.translate_all_prompts)
+        self.prompt_list.translationStarted.connect(self._on_translation_started)
+        self.prompt_list.translationFinished.connect(self._on_translation_finished)
         self.prompt_list.itemSelectionChanged.connect(self.highlight_selected_text)
         self.prompt_list.model().rowsMoved.connect(self.on_rows_moved)
         self.library_button.clicked.connect(self.show_prompt_library)
         
+        # 输入停顿后在后台预翻译新的中文提示词，生成列表时直接使用缓存
+        self.pretranslator = Pretranslator()
+        self.pretranslate_timer = QTimer(self)
+        self.pretranslate_timer.setSingleShot(True)
+        self.pretranslate_timer.setInterval(PRETRANSLATE_DELAY)
+        self.pretranslate_timer.timeout.connect(self.pretranslate)
+        self.input_field.textChanged.connect(self.pretranslate_timer.start)
+        
+        # 输入框中的列表项，与未禁用的行一一对应；输入时增量更新列表
+        self.prompt_parser = IncrementalParser()
+        self.input_field.textChanged.connect(self.sync_prompt_list)
+        # 各行在输入框中的范围，列表或输入框改变后在下次高亮时重建
+        self._spans = None
+        
         main_layout.addLayout(left_layout)
         main_layout.addWidget(self.prompt_list)
         
@@ -127,122 +171,230 @@ class PromptEditor(QWidget):
 
     def normalize_text(self, text):
         """规范化提示词文本格式"""
-        # 替换中文逗号为英文逗号
-        text = text.replace('，', ',')
-        
-        # 分割文本，同时处理多个连续逗号的情况
-        parts = [part.strip() for part in text.split(',')]
-        # 过滤掉空字符串
-        parts = [part for part in parts if part]
-        
+        # 只在顶层的逗号（包括中文逗号）处分割，括号、LoRA 等语法内部的逗号保持不变
+        items = prompt_items(parse_prompt(text))
         # 使用标准格式重新组合（逗号+空格）
-        return ', '.join(parts)
+        return ', '.join(item.source for item in items)
     
     def generate_prompt_list(self):
-        """将文本规范化并生成提示词列表"""
-        text = self.input_field.toPlainText()
-        normalized_text = self.normalize_text(text)
-        
-        # 分割提示词
-        prompts = normalized_text.split(', ')
-        self.prompt_list.clear()
-        
-        # 使用元组存储 (索引, 提示词)
-        indexed_prompts = list(enumerate(prompts))
+        """同步提示词列表，规范化输入框并翻译新的中文提示词"""
+        self.prompt_list.cancel_translation()
+        self.sync_prompt_list()
         
-        # 分别收集中文和其他提示词，保留原始索引
-        chinese_prompts = []
-        other_prompts = []
-        
-        for idx, prompt in indexed_prompts:
-            if not prompt:
-                continue
-            
-            # 检查是否包含中文字符
-            has_chinese = any('\u4e00' <= char <= '\u9fff' for char in prompt)
-            if has_chinese:
-                chinese_prompts.append((idx, prompt))
-            else:
-                other_prompts.append((idx, prompt, ""))
-        
-        # 批量翻译中文提示词
-        if chinese_prompts:
-            try:
-                translation_service = TranslationService()
-                translated_prompts = translation_service.translate_prompts(
-                    chinese_prompts, 
-                    to_english=True
-                )
-                other_prompts.extend(translated_prompts)
-                    
-            except TranslationError as e:
-                QMessageBox.warning(self, "翻译错误", str(e))
-                # 翻译失败时使用原文
-                for idx, prompt in chinese_prompts:
-                    other_prompts.append((idx, prompt, ""))
-        
-        # 按原始索引排序
-        sorted_prompts = sorted(other_prompts, key=lambda x: x[0])
-        
-        # 添加所有提示词到列表，现在已经按原始顺序排序
-        for _, prompt, translation in sorted_prompts:
-            item = QTreeWidgetItem([prompt, translation, "1"])  # 添加默认权重
-            self.prompt_list.addTopLevelItem(item)
-        
-        # 更新输入框内容为规范化的英文提示词
+        # 更新输入框内容为规范化的提示词，翻译完成后再替换为英文
         self.update_input_field()
+        rows, _ = self._enabled_rows()
+        kinds = classify_many([row.text(0) for row in rows])
+        chinese_items = [row for row, kind in zip(rows, kinds) if kind != LATIN and not row.text(1)]
+        self.prompt_list.translate_items(chinese_items, to_english=True)
 
-    def update_input_field(self):
-        """更新文本编辑框内容"""
-        prompts = []
+    def sync_prompt_list(self):
+        """输入框修改后只重新解析修改处，并对列表做最少的增删，返回新建的行"""
+        text = self.input_field.toPlainText()
+        if text == self.prompt_parser.source:
+            return []
+        old_items = self.prompt_parser.items
+        lo, old_hi, new_hi = self.prompt_parser.update(text)
+        self._spans = None
+        rows, indexes = self._enabled_rows()
+        if len(rows) != len(old_items):
+            # 列表与输入框不一致时整体比较
+            old_keys = [row_source(row) for row in rows]
+            lo, old_hi, new_hi = 0, len(rows), len(self.prompt_parser.items)
+        else:
+            old_keys = [item.source for item in old_items[lo:old_hi]]
+        return self._apply_items(rows, indexes, old_keys, self.prompt_parser.items,
+                                 lo, old_hi, new_hi)
+
+    def _enabled_rows(self):
+        """未禁用的行及其位置"""
+        rows = []
+        indexes = []
         for i in range(self.prompt_list.topLevelItemCount()):
             item = self.prompt_list.topLevelItem(i)
-            # 检查是否禁用
-            if item.data(0, Qt.ItemDataRole.UserRole):
+            if not item.data(0, Qt.ItemDataRole.UserRole):
+                rows.append(item)
+                indexes.append(i)
+        return rows, indexes
+
+    def _apply_items(self, rows, indexes, old_keys, items, lo, old_hi, new_hi):
+        """把 rows[lo:old_hi]（原文为 old_keys）更新为 items[lo:new_hi]
+
+        按原文求最短编辑：相同的行保持不变，删除后又插入的相同提示词移动
+        原来的行，翻译、权重等状态随行保留。插入的提示词依次优先使用原文
+        相同的被删除行、原文相同的禁用行、文本相同（只有权重不同）的被删除行
+        和禁用行，因此撤销禁用或修改权重后恢复原来的行。返回新建的行。
+        """
+        opcodes = diff_opcodes(old_keys, [item.source for item in items[lo:new_hi]])
+        
+        # 先取出被删除的行，插入相同原文的提示词时移动这些行
+        removed = {}
+        removed_text = {}
+        taken = []
+        for tag, i1, i2, _, _ in opcodes:
+            if tag != 'equal':
+                for i in range(i1, i2):
+                    row = rows[lo + i]
+                    removed.setdefault(old_keys[i], []).append(row)
+                    removed_text.setdefault(row.text(0), []).append(row)
+                    taken.append(indexes[lo + i])
+        for index in sorted(taken, reverse=True):
+            self.prompt_list.takeTopLevelItem(index)
+        
+        created = []
+        # 已经复用的行（按 id），同一行可能同时以原文和文本登记
+        used = set()
+        disabled = disabled_text = None
+        anchor = rows[lo - 1] if lo else None
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                anchor = rows[lo + i2 - 1]
                 continue
-            prompt = item.text(0)
-            weight = item.text(2)
-            # 修改格式化方式
-            if weight and weight != "1":
-                prompt = f"({prompt}:{weight})"
-            prompts.append(prompt)
-        self.input_field.setPlainText(', '.join(prompts))
+            index = self.prompt_list.indexOfTopLevelItem(anchor) + 1 if anchor else 0
+            for prompt in items[lo + j1:lo + j2]:
+                row = self._take_row(removed, prompt.source, used)
+                if row is None:
+                    if disabled is None:
+                        disabled, disabled_text = self._disabled_rows()
+                    row = (self._take_row(disabled, prompt.source, used)
+                           or self._take_row(removed_text, prompt.text, used)
+                           or self._take_row(disabled_text, prompt.text, used))
+                    if row is None:
+                        row = QTreeWidgetItem([prompt.text, "", prompt.weight])
+                        created.append(row)
+                    else:
+                        if row.data(0, Qt.ItemDataRole.UserRole):
+                            # 重新启用禁用的行，移到插入位置
+                            position = self.prompt_list.indexOfTopLevelItem(row)
+                            self.prompt_list.takeTopLevelItem(position)
+                            if position < index:
+                                index -= 1
+                            row.setData(0, Qt.ItemDataRole.UserRole, False)
+                        row.setText(2, prompt.weight)
+                    row.setData(0, SOURCE_ROLE, (prompt.source, prompt.text, prompt.weight))
+                self.prompt_list.insertTopLevelItem(index, row)
+                index += 1
+                anchor = row
+        return created
+
+    def _disabled_rows(self):
+        """禁用的行，按原文和文本分别登记：{原文: [行]}, {文本: [行]}"""
+        by_source = {}
+        by_text = {}
+        for i in range(self.prompt_list.topLevelItemCount()):
+            item = self.prompt_list.topLevelItem(i)
+            if item.data(0, Qt.ItemDataRole.UserRole):
+                by_source.setdefault(row_source(item), []).append(item)
+                by_text.setdefault(item.text(0), []).append(item)
+        return by_source, by_text
+
+    @staticmethod
+    def _take_row(candidates, key, used):
+        """从 candidates[key] 中取出第一个尚未复用的行"""
+        rows = candidates.get(key)
+        while rows:
+            row = rows.pop(0)
+            if id(row) not in used:
+                used.add(id(row))
+                return row
+        return None
+
+    def pretranslate(self):
+        """预翻译输入框中的中文提示词，已删除的提示词不再翻译"""
+        self.sync_prompt_list()
+        texts = [item.text for item in self.prompt_parser.items]
+        segments = []
+        # 与翻译时相同：纯中文整体翻译，中英混合只翻译中文片段
+        for text, kind in zip(texts, classify_many(texts)):
+            if kind == CJK:
+                segments.append(text)
+            elif kind == MIXED:
+                segments.extend(text[start:end] for start, end in cjk_spans(text))
+        self.pretranslator.update(segments)
+
+    def closeEvent(self, event):
+        """关闭窗口时取消尚未开始的预翻译"""
+        self.pretranslate_timer.stop()
+        self.pretranslator.close()
+        super().closeEvent(event)
+
+    def update_input_field(self):
+        """更新文本编辑框内容"""
+        # 禁用的行不写入输入框
+        rows, indexes = self._enabled_rows()
+        sources = [row_source(row) for row in rows]
+        text = ', '.join(sources)
+        self.prompt_parser.reset(text)
+        self._spans = None
+        items = self.prompt_parser.items
+        if [item.source for item in items] != sources:
+            # 编辑后的提示词含有顶层逗号时拆分为多行
+            self._apply_items(rows, indexes, sources, items, 0, len(rows), len(items))
+        else:
+            # 翻译或编辑过的行以写入的文本作为原文
+            for row, item in zip(rows, items):
+                source = (item.source, row.text(0), row.text(2))
+                if row.data(0, SOURCE_ROLE) != source:
+                    row.setData(0, SOURCE_ROLE, source)
+        self._replace_text(text)
+        self.highlight_selected_text()
+
+    def _replace_text(self, text):
+        """把输入框内容改为 text
+
+        只替换与原内容不同的部分，并作为一次编辑加入撤销记录；使用单独的
+        光标编辑，用户的光标和滚动位置保持不变。
+        """
+        old_text = self.input_field.toPlainText()
+        if old_text == text:
+            return
+        prefix, suffix = common_affixes(old_text, text)
+        astral = astral_positions(old_text)
+        start = prefix + bisect_left(astral, prefix)
+        end = len(old_text) - suffix
+        end += bisect_left(astral, end)
+        
+        cursor = QTextCursor(self.input_field.document())
+        cursor.beginEditBlock()
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        cursor.removeSelectedText()
+        inserted = text[prefix:len(text) - suffix]
+        if inserted:
+            cursor.insertText(inserted)
+        cursor.endEditBlock()
 
     def highlight_selected_text(self):
         """当列表项被选中时，高亮对应的文本"""
-        # 获取当前选中的列表项
+        selections = []
         selected_items = self.prompt_list.selectedItems()
-        if not selected_items:
-            # 如果没有选中项，清除所有高亮
-            cursor = self.input_field.textCursor()
-            cursor.select(QTextCursor.SelectionType.Document)
-            cursor.setCharFormat(QTextCharFormat())
-            cursor.clearSelection()
-            return
-            
-        # 获取选中项的文本（第0列是提示词）
-        selected_text = selected_items[0].text(0)
-        
-        # 在文本编辑框中查找并高亮对应文本
-        document = self.input_field.document()
-        cursor = QTextCursor(document)
-        
-        # 创建高亮格式
-        highlight_format = QTextCharFormat()
-        highlight_format.setBackground(QColor("#2d5a88"))  # 深蓝色
-        highlight_format.setForeground(QColor("#ffffff"))  # 白色
-        
-        # 清除之前的高亮
-        cursor.select(QTextCursor.SelectionType.Document)
-        cursor.setCharFormat(QTextCharFormat())
-        cursor.clearSelection()
-        
-        # 查找并高亮新的选中文本
-        cursor = QTextCursor(document)
-        while not cursor.isNull():
-            cursor = document.find(selected_text, cursor)
-            if not cursor.isNull():
-                cursor.mergeCharFormat(highlight_format)
+        span = self._span(selected_items[0]) if selected_items else None
+        if span is not None:
+            # 只在对应的范围上叠加额外选区，不修改文档本身的格式
+            cursor = QTextCursor(self.input_field.document())
+            cursor.setPosition(span[0])
+            cursor.setPosition(span[1], QTextCursor.MoveMode.KeepAnchor)
+            highlight_format = QTextCharFormat()
+            highlight_format.setBackground(QColor("#2d5a88"))  # 深蓝色
+            highlight_format.setForeground(QColor("#ffffff"))  # 白色
+            selection = QTextEdit.ExtraSelection()
+            selection.cursor = cursor
+            selection.format = highlight_format
+            selections.append(selection)
+        self.input_field.setExtraSelections(selections)
+
+    def _span(self, row):
+        """行在输入框中对应的范围（文档位置），禁用的行返回 None"""
+        if self._spans is None:
+            # 列表项的位置按 Python 字符计算，文档位置按 UTF-16 计算
+            astral = astral_positions(self.prompt_parser.source)
+            rows, _ = self._enabled_rows()
+            # QTreeWidgetItem 不可哈希，按 id 登记
+            self._spans = {}
+            for enabled_row, item in zip(rows, self.prompt_parser.items):
+                self._spans[id(enabled_row)] = (item.start + bisect_left(astral, item.start),
+                                                item.end + bisect_left(astral, item.end))
+        return self._spans.get(id(row))
 
     def on_rows_moved(self, parent, start, end, destination, row):
         """当列表项被拖动后，重新高亮选中项"""
@@ -255,8 +407,20 @@ class PromptEditor(QWidget):
             self.highlight_selected_text() 
 
     def translate_all_prompts(self):
-        """触发所有提示词的翻译"""
-        self.prompt_list.translate_all_prompts() 
+        """触发所有提示词的翻译，翻译进行中时取消翻译"""
+        if self.prompt_list.is_translating():
+            self.prompt_list.cancel_translation()
+        else:
+            self.prompt_list.translate_all_prompts()
+
+    def _on_translation_started(self):
+        self.translate_button.setText("取消翻译")
+
+    def _on_translation_finished(self, to_english):
+        self.translate_button.setText("翻译所有提示词")
+        if to_english:
+            # 中文提示词已替换为英文
+            self.update_input_field()
 
     def show_prompt_library(self):
         """显示提示词库对话框"""
@@ -282,9 +446,11 @@ class PromptEditor(QWidget):
             if current_text:
                 current_text += ", "
             current_text += ", ".join(new_prompts)
-            self.input_field.setPlainText(current_text)
+            self._replace_text(current_text)
             
-            # 直接添加到列表，包含中文翻译和默认权重
-            for en, zh in selected_prompts:
-                item = QTreeWidgetItem([en, zh, "1"])  # 添加默认权重
-                self.prompt_list.addTopLevelItem(item) 
\ No newline at end of file
+            # 列表已随输入框更新，新添加的行填入提示词库中的中文
+            translations = dict(selected_prompts)
+            rows, _ = self._enabled_rows()
+            for row in rows:
+                if not row.text(1) and row.text(0) in translations:
+                    row.setText(1, translations[row.text(0)])
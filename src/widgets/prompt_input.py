@@ -0,0 +1,100 @@
+from PyQt6.QtWidgets import QTextEdit, QCompleter
+from PyQt6.QtGui import QTextCursor, QStandardItemModel, QStandardItem
+from PyQt6.QtCore import Qt, QModelIndex
+from ..data.prompt_library import PROMPT_LIBRARY
+from ..styles.dark_theme import COMPLETER_POPUP
+
+# 提示词之间以及权重语法中的分隔符，光标前最后一个分隔符之后的内容作为补全前缀
+TOKEN_SEPARATORS = ',，()（）[]{}|:\n'
+
+# 最多显示的补全数量
+COMPLETION_LIMIT = 10
+
+class PromptInputEdit(QTextEdit):
+    """输入提示词时根据提示词库自动补全的文本框"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._model = QStandardItemModel(self)
+        self._completer = QCompleter(self._model, self)
+        self._completer.setWidget(self)
+        # 候选已由提示词库排序，不再由 QCompleter 过滤
+        self._completer.setCompletionMode(
+            QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self._completer.popup().setStyleSheet(COMPLETER_POPUP)
+        self._completer.activated[QModelIndex].connect(self._insert_completion)
+        # 当前补全前缀在文档中的起始位置
+        self._token_start = 0
+    
+    def focusInEvent(self, event):
+        """补全索引在第一次使用时才建立，获得焦点时就在后台开始"""
+        PROMPT_LIBRARY.prepare_completion()
+        super().focusInEvent(event)
+    
+    def keyPressEvent(self, event):
+        """补全列表显示时，确认和取消按键交给补全列表处理"""
+        if self._completer.popup().isVisible() and event.key() in (
+                Qt.Key.Key_Enter, Qt.Key.Key_Return, Qt.Key.Key_Tab,
+                Qt.Key.Key_Backtab, Qt.Key.Key_Escape):
+            event.ignore()
+            return
+        super().keyPressEvent(event)
+        if event.text() or event.key() == Qt.Key.Key_Backspace:
+            self._update_completions()
+        else:
+            self._completer.popup().hide()
+
+    def inputMethodEvent(self, event):
+        """输入法（如中文拼音）提交的文字不经过 keyPressEvent，提交后同样刷新补全"""
+        super().inputMethodEvent(event)
+        if event.commitString():
+            self._update_completions()
+
+    def _current_token(self):
+        """返回光标前的补全前缀及其起始位置"""
+        cursor = self.textCursor()
+        if cursor.hasSelection():
+            return "", cursor.position()
+        block_text = cursor.block().text()[:cursor.positionInBlock()]
+        start = max(block_text.rfind(sep) for sep in TOKEN_SEPARATORS) + 1
+        token = block_text[start:]
+        stripped = token.lstrip()
+        return stripped, cursor.block().position() + start + len(token) - len(stripped)
+    
+    def _update_completions(self):
+        """根据光标前的内容刷新补全列表"""
+        popup = self._completer.popup()
+        token, self._token_start = self._current_token()
+        completions = PROMPT_LIBRARY.complete(token, COMPLETION_LIMIT) if token else []
+        # 已经完整输入唯一的候选时不再提示
+        if not completions or (len(completions) == 1 and completions[0].text == token):
+            popup.hide()
+            return
+        
+        self._model.clear()
+        for completion in completions:
+            if completion.term == completion.text:
+                label = f"{completion.text}    {completion.hint}" if completion.hint else completion.text
+            else:
+                label = f"{completion.term} → {completion.text}"
+            item = QStandardItem(label)
+            item.setData(completion.text, Qt.ItemDataRole.UserRole)
+            self._model.appendRow(item)
+        
+        rect = self.cursorRect()
+        rect.setWidth(popup.sizeHintForColumn(0) +
+                      popup.verticalScrollBar().sizeHint().width())
+        self._completer.complete(rect)
+        popup.setCurrentIndex(self._model.index(0, 0))
+    
+    def _insert_completion(self, index):
+        """用选中的英文提示词替换光标前的补全前缀"""
+        en = index.data(Qt.ItemDataRole.UserRole)
+        if not en:
+            return
+        cursor = self.textCursor()
+        end = cursor.position()
+        cursor.setPosition(self._token_start)
+        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(en)
+        self.setTextCursor(cursor)
+        PROMPT_LIBRARY.record_completion_use(en)
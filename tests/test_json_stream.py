@@ -0,0 +1,49 @@
+"""json_stream 的回归测试：内容为结构符号的字符串不能被当作结构"""
+import io
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.data.json_stream import iter_library_records, read_prompts_range, write_library_json
+
+SYMBOLS = ['}', ',', ']', ':', '{', '[']
+
+
+def _library():
+    data = {}
+    for symbol in SYMBOLS:
+        data[symbol] = {'name': symbol, 'description': symbol,
+                        'prompts': [{'en': symbol, 'zh': symbol}]}
+    data['last'] = {'name': 'last', 'description': '', 'prompts': [{'en': 'cat', 'zh': '猫'}]}
+    return data
+
+
+def test_symbol_strings_round_trip(tmp_path):
+    data = _library()
+    path = tmp_path / 'library.json'
+    buffer = io.BytesIO()
+    write_library_json(buffer, data)
+    path.write_bytes(buffer.getvalue())
+
+    # 小块读取同时覆盖块边界截断的情况
+    for chunk_size in (7, 1024 * 1024):
+        ranges = {}
+        records = list(iter_library_records(str(path), chunk_size=chunk_size, ranges=ranges))
+        categories = [r[1] for r in records if r[0] == 'add_category']
+        prompts = [(r[1], r[2], r[3]) for r in records if r[0] == 'add_prompt']
+        assert categories == list(data)
+        assert prompts == [(key, cat['prompts'][0]['en'], cat['prompts'][0]['zh'])
+                           for key, cat in data.items()]
+        for key, cat in data.items():
+            assert read_prompts_range(str(path), ranges[key]) == [
+                (p['en'], p['zh']) for p in cat['prompts']]
+
+
+def test_symbol_strings_in_nested_values(tmp_path):
+    path = tmp_path / 'library.json'
+    path.write_text('{"}": {"name": "}", "extra": {"]": [",", "}"], ":": "{"}, '
+                    '"prompts": [{"en": "]", "zh": ","}]}, "b": {"name": "b", "prompts": []}}',
+                    encoding='utf-8')
+    records = list(iter_library_records(str(path), chunk_size=5))
+    assert records == [('add_category', '}', '}', ''), ('add_prompt', '}', ']', ','),
+                       ('add_category', 'b', 'b', '')]
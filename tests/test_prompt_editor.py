@@ -0,0 +1,74 @@
+"""PromptEditor 的回归测试：选中和拖动列表项时高亮输入框中对应的提示词"""
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+pytest.importorskip('PyQt6.QtWidgets')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PyQt6.QtCore import QMimeData, QPointF, Qt
+from PyQt6.QtGui import QDropEvent
+from PyQt6.QtWidgets import QApplication
+from src.widgets.prompt_editor import PromptEditor
+
+
+class _InternalDrop(QDropEvent):
+    """来自列表自身的拖放事件"""
+    def __init__(self, source, pos):
+        super().__init__(QPointF(pos), Qt.DropAction.MoveAction, QMimeData(),
+                         Qt.MouseButton.LeftButton, Qt.KeyboardModifier.NoModifier)
+        self._source = source
+
+    def source(self):
+        return self._source
+
+
+@pytest.fixture
+def editor():
+    app = QApplication.instance() or QApplication(sys.argv)
+    editor = PromptEditor()
+    editor.show()
+    editor.input_field.setPlainText('cat, dog, bird')
+    editor.sync_prompt_list()
+    yield editor
+    editor.close()
+    app.processEvents()
+
+
+def _highlighted(editor):
+    selections = editor.input_field.extraSelections()
+    return [selection.cursor.selectedText() for selection in selections]
+
+
+def _rows(editor):
+    tree = editor.prompt_list
+    return [tree.topLevelItem(i).text(0) for i in range(tree.topLevelItemCount())]
+
+
+def test_select_row_highlights_prompt(editor):
+    tree = editor.prompt_list
+    tree.setCurrentItem(tree.topLevelItem(1))
+    assert _highlighted(editor) == ['dog']
+    tree.setCurrentItem(tree.topLevelItem(2))
+    assert _highlighted(editor) == ['bird']
+
+
+def test_drop_row_moves_prompt_and_highlight(editor):
+    tree = editor.prompt_list
+    tree.setCurrentItem(tree.topLevelItem(2))
+    target = tree.visualItemRect(tree.topLevelItem(0)).center()
+    tree.dropEvent(_InternalDrop(tree, target))
+    assert _rows(editor) == ['bird', 'cat', 'dog']
+    assert editor.input_field.toPlainText() == 'bird, cat, dog'
+    assert _highlighted(editor) == ['bird']
+
+
+def test_rows_moved_highlights_moved_row(editor):
+    tree = editor.prompt_list
+    tree.insertTopLevelItem(0, tree.takeTopLevelItem(1))
+    editor.update_input_field()
+    editor.on_rows_moved(None, 1, 1, None, 0)
+    assert editor.input_field.toPlainText() == 'dog, cat, bird'
+    assert _highlighted(editor) == ['dog']